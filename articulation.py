@@ -0,0 +1,81 @@
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+# numpy is imported inside the matrix functions so keywords() (used by repair on
+# every text-mode subject) does not pay for it
+
+# Cosine similarity cut-offs for correlation levels 1, 2 and 3; below the first is "-"
+ARTICULATION_THRESHOLDS = [float(t) for t in os.getenv("ARTICULATION_THRESHOLDS", "0.05,0.12,0.25").split(",")]
+
+STOPWORDS = set("""
+a an and are as at be by can for from in into is it its of on or that the their them this to with within
+will using use used based various key ideas ability able students student knowledge concepts principles
+""".split())
+
+WORD = re.compile(r"[a-z][a-z\-]+")
+OUTCOME_CODE = re.compile(r"^\s*(?:CO|PO)\s*\d+\s*[:.\-]\s*", re.IGNORECASE)
+BLOOM_SUFFIX = re.compile(r"\((?:Remembering|Understanding|Applying|Analyzing|Evaluating|Creating)\)\s*$", re.IGNORECASE)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    for suffix in ("ations", "ation", "ings", "ing", "ies", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[: -len(suffix)] + ("y" if suffix == "ies" else "")
+    return word
+
+
+def keywords(outcome):
+    """Stemmed content words of an outcome, without its CO/PO code or Bloom level."""
+    text = BLOOM_SUFFIX.sub("", OUTCOME_CODE.sub("", outcome)).lower()
+    return [stem(word) for word in WORD.findall(text) if word not in STOPWORDS]
+
+
+def idf_weights(documents):
+    """Smoothed inverse document frequency over a list of keyword lists."""
+    df = Counter(term for doc in documents for term in set(doc))
+    n = len(documents)
+    return {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+
+
+def _tfidf(docs, vocab, idf):
+    import numpy as np
+
+    matrix = np.zeros((len(docs), len(vocab)))
+    for row, doc in enumerate(docs):
+        for term, count in Counter(doc).items():
+            matrix[row, vocab[term]] = count * idf.get(term, 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def articulation_matrix(course_outcomes, program_outcomes, idf=None, thresholds=None):
+    """CO x PO correlation levels (0 = none, 1-3) as an int array.
+
+    COs and POs become TF-IDF vectors over the subject's own vocabulary, and
+    all cosine similarities come from a single matrix product. idf defaults to
+    weights over this subject's outcomes; pass program-wide weights to score a
+    batch consistently.
+    """
+    cos = [keywords(co) for co in course_outcomes]
+    pos = [keywords(po) for po in program_outcomes]
+    return _levels(cos, pos, idf or idf_weights(cos + pos), thresholds)
+
+
+def _levels(cos, pos, idf, thresholds=None):
+    import numpy as np
+
+    vocab = {term: idx for idx, term in enumerate({term for doc in cos + pos for term in doc})}
+    similarity = _tfidf(cos, vocab, idf) @ _tfidf(pos, vocab, idf).T
+    return np.digitize(similarity, thresholds or ARTICULATION_THRESHOLDS)
+
+
+def outcome_codes(outcomes, prefix):
+    codes = []
+    for idx, outcome in enumerate(outcomes, start=1):
+        match = OUTCOME_CODE.match(outcome)
+        codes.append(match.group(0).strip(" :.-") if match else f"{prefix}{idx}")
+    return codes
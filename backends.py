@@ -0,0 +1,278 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+
+BLOOM_VERBS = {
+    "Remembering": "Define",
+    "Understanding": "Explain",
+    "Applying": "Apply",
+    "Analyzing": "Analyze",
+    "Evaluating": "Evaluate",
+    "Creating": "Design",
+}
+
+# Share of a streamed call's latency spent before the first chunk arrives
+FIRST_CHUNK_FRACTION = 0.2
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) that needs no API call."""
+    return len(text) // 4 + 1
+
+
+class GeminiBackend:
+    """Thin wrapper around genai.GenerativeModel that configures the API on construction."""
+
+    def __init__(self, model_name="gemini-1.5-flash", api_key=None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable not set!")
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+        self.model_name = self._model.model_name
+
+    def generate_content(self, prompt, **settings):
+        return self._model.generate_content(prompt, **settings)
+
+    def count_tokens(self, text):
+        return self._model.count_tokens(text).total_tokens
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeServiceError(Exception):
+    """Error raised by FakeBackend; code mirrors the HTTP status of google.api_core errors."""
+
+    def __init__(self, message, code=500, retry_after=None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class FakeBackend:
+    """Offline stand-in for Gemini that answers in the refine3 CO/PO format.
+
+    latency is "constant:S", "uniform:LO:HI", "exponential:MEAN" or
+    "lognormal:MEDIAN:SIGMA" (seconds). error_rate and rate_limit_rate are the
+    probabilities of failing a call with a 500 or a 429 respectively, and
+    malformed_rate the probability of an answer cut off before its POs.
+    """
+
+    def __init__(self, latency="constant:0", error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=None, model_name="fake-gemini", chunk_size=64, malformed_rate=0.0):
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sample_latency(self.latency)  # validate the spec up front
+
+    @classmethod
+    def from_env(cls, model_name="fake-gemini"):
+        seed = os.getenv("FAKE_SEED")
+        return cls(
+            model_name=model_name,
+            malformed_rate=float(os.getenv("FAKE_MALFORMED_RATE", "0")),
+            latency=os.getenv("FAKE_LATENCY", "constant:0"),
+            error_rate=float(os.getenv("FAKE_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("FAKE_429_RATE", "0")),
+            retry_after=float(os.getenv("FAKE_RETRY_AFTER", "1")),
+            seed=int(seed) if seed is not None else None,
+        )
+
+    def _sample_latency(self, spec):
+        kind, *params = spec.split(":")
+        params = [float(p) for p in params]
+        with self._lock:
+            if kind == "constant":
+                return params[0]
+            if kind == "uniform":
+                return self._random.uniform(params[0], params[1])
+            if kind == "exponential":
+                return self._random.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+            if kind == "lognormal":
+                return params[0] * self._random.lognormvariate(0.0, params[1])
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def count_tokens(self, text):
+        return estimate_tokens(text)
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def generate_content(self, prompt, stream=False, **settings):
+        latency = self._sample_latency(self.latency)
+        time.sleep(latency * FIRST_CHUNK_FRACTION if stream else latency)
+
+        roll = self._roll()
+        if roll < self.rate_limit_rate:
+            raise FakeServiceError("429 Resource has been exhausted (fake)", code=429, retry_after=self.retry_after)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeServiceError("500 Internal error (fake)", code=500)
+
+        config = settings.get("generation_config") or {}
+        if config.get("response_mime_type") == "application/json":
+            text = fake_outcomes_json(prompt)
+        else:
+            text = fake_outcomes(prompt)
+            if self.malformed_rate and self._roll() < self.malformed_rate:
+                text = text.split("### Program Outcomes")[0]
+        if not stream:
+            return FakeResponse(text, FakeUsage(estimate_tokens(str(prompt)), estimate_tokens(text)))
+        return self._stream(text, latency * (1 - FIRST_CHUNK_FRACTION), FakeUsage(estimate_tokens(str(prompt)), estimate_tokens(text)))
+
+    def _stream(self, text, remaining, usage):
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep(remaining / (len(chunks) - 1))
+            # Like Gemini, the final chunk carries the usage metadata for the whole call
+            yield FakeResponse(chunk, usage if idx == len(chunks) - 1 else None)
+
+
+def fake_outcomes(prompt):
+    """Build a well-formed "### Course Outcomes / ### Program Outcomes" answer for prompt.
+
+    Batched prompts (subjects introduced by "=== SUBJECT n ===" lines) get one
+    delimited answer block per subject.
+    """
+    blocks = re.split(r"^(=== SUBJECT \d+ ===)$", prompt, flags=re.MULTILINE)
+    if len(blocks) > 1:
+        return "\n\n".join(f"{marker}\n{fake_outcomes(body)}" for marker, body in zip(blocks[1::2], blocks[2::2]))
+
+    lines = ["### Course Outcomes"]
+    for unit in _fake_units(prompt):
+        for co_id, level, text in unit["course_outcomes"]:
+            lines.append(f"- {co_id}: {text}")
+
+    lines.append("")
+    lines.append("### Program Outcomes")
+    for po_id, text in _fake_program_outcomes(prompt):
+        lines.append(f"- {po_id}: {text}")
+    return "\n".join(lines)
+
+
+def fake_outcomes_json(prompt):
+    """Build a JSON answer in the structured.OUTCOME_SCHEMA shape for prompt."""
+    return json.dumps({
+        "units": [
+            {
+                "unit": idx,
+                "title": unit["title"],
+                "course_outcomes": [{"id": co_id, "bloom_level": level, "text": text} for co_id, level, text in unit["course_outcomes"]],
+            }
+            for idx, unit in enumerate(_fake_units(prompt), start=1)
+        ],
+        "program_outcomes": [{"id": po_id, "text": text} for po_id, text in _fake_program_outcomes(prompt)],
+    })
+
+
+def _subject_title(prompt):
+    title = re.search(r"^Subject Title: (.+)$", prompt, re.MULTILINE)
+    return title.group(1).strip() if title else "the subject"
+
+
+def _fake_units(prompt):
+    units = re.findall(r"^Unit \d+: (.+)$", prompt, re.MULTILINE) or [_subject_title(prompt)]
+    levels = re.findall(r"^- Bloom.s Taxonomy Levels: (.+)$", prompt, re.MULTILINE)
+
+    result = []
+    n = 0
+    for idx, unit in enumerate(units):
+        unit_levels = levels[idx].split(", ") if idx < len(levels) else ["Understanding", "Applying"]
+        outcomes = []
+        for level in (unit_levels * 2)[:2]:
+            n += 1
+            level = level.strip() if level.strip() in BLOOM_VERBS else "Understanding"
+            outcomes.append((f"CO{n}", level, f"{BLOOM_VERBS[level]} the key ideas of {unit.strip()}."))
+        result.append({"title": unit.strip(), "course_outcomes": outcomes})
+    return result
+
+
+def _fake_program_outcomes(prompt):
+    title = _subject_title(prompt)
+    verbs = ["Apply", "Analyze", "Design", "Evaluate", "Communicate", "Engage"]
+    return [(f"PO{n}", f"{verb} knowledge of {title} in professional practice.") for n, verb in enumerate(verbs, start=1)]
+
+
+class CacheMissError(LookupError):
+    pass
+
+
+class OfflineBackend:
+    """Backend that never reaches an API, for render-only runs served from the response cache.
+
+    model_name must match the name the real backend reports so cache keys line up.
+    """
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, **settings):
+        raise CacheMissError("no cached response for this prompt (render-only mode)")
+
+    def count_tokens(self, text):
+        return estimate_tokens(text)
+
+
+def offline_backend(name=None):
+    name = name or os.getenv("MODEL_BACKEND", "gemini")
+    model_name = configured_model_name(name)
+    # genai.GenerativeModel reports its name with a "models/" prefix
+    if name == "gemini" and not model_name.startswith("models/"):
+        model_name = f"models/{model_name}"
+    return OfflineBackend(model_name)
+
+
+def configured_model_name(name=None):
+    """Model name get_backend would use, without constructing (or configuring) it."""
+    name = name or os.getenv("MODEL_BACKEND", "gemini")
+    if name == "fake":
+        return "fake-gemini"
+    if name == "replay":
+        from cassette import cassette_model_name
+        return cassette_model_name() or "replay"
+    return os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+
+def get_backend(name=None, model_name=None):
+    """Return the backend selected by name or the MODEL_BACKEND env var ("gemini", "fake" or "replay").
+
+    With CASSETTE_RECORD=1 every call is also appended to the CASSETTE file;
+    "replay" serves those recordings back without calling any model.
+    """
+    name = name or os.getenv("MODEL_BACKEND", "gemini")
+    if name == "gemini":
+        backend = GeminiBackend(model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+    elif name == "fake":
+        backend = FakeBackend.from_env(model_name or "fake-gemini")
+    elif name == "replay":
+        from cassette import ReplayBackend
+        return ReplayBackend.from_env()
+    else:
+        raise ValueError(f"Unknown model backend: {name}")
+
+    if os.getenv("CASSETTE_RECORD", "0") == "1":
+        from cassette import RecordingBackend
+        backend = RecordingBackend(backend)
+    return backend
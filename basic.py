@@ -1,6 +1,7 @@
 
 import os
 import google.generativeai as genai
+from model_catalog import list_models
 
 # Load API key securely
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -8,11 +9,11 @@ if not GOOGLE_API_KEY:
     raise EnvironmentError("GOOGLE_API_KEY is not set!")
 genai.configure(api_key=GOOGLE_API_KEY)
 
-# List available models
-models = genai.list_models()
+# List available models (cached on disk, see model_catalog.py)
+models = list_models()
 print("Available models:")
 for model in models:
-    print(model.name)
+    print(model["name"])
 
 # Initialize model (use a valid model name)
 model = genai.GenerativeModel('gemini-1.5-flash')  # Or 'gemini-pro'
@@ -0,0 +1,139 @@
+import re
+
+from backends import estimate_tokens
+from engine import run_concurrently
+import journal
+import store
+import telemetry
+from refine3 import format_units, parse_outcomes, process_subject, save_outcomes
+from repair import repair_outcomes
+
+# Rough size of one subject's CO/PO answer, used when packing batches
+OUTPUT_TOKENS_PER_SUBJECT = 600
+
+SUBJECT_MARKER = re.compile(r"^\s*=+\s*SUBJECT\s+(\d+)\s*=+\s*$", re.MULTILINE)
+
+BATCH_INSTRUCTIONS = """
+You are an education expert helping generate course and program outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+You are given {count} subjects below. Each subject starts with a line of the form "=== SUBJECT <number> ===".
+
+### Instructions:
+For EACH subject, generate exactly 2–3 **Course Outcomes (COs)** per unit, numbered from CO1 within that subject.
+
+Also, for EACH subject, generate exactly 6 **Program Outcomes (POs)** based on its program and aim, numbered PO1 to PO6.
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with Bloom's Taxonomy
+- Written in concise, academic language
+
+Output one block per subject, in the same order as the input, each in exactly this format:
+---
+=== SUBJECT <number> ===
+### Course Outcomes
+- CO1: ...
+- CO2: ...
+...
+
+### Program Outcomes
+- PO1: ...
+- PO2: ...
+...
+---
+Do NOT include any other text or explanation.
+
+"""
+
+
+def subject_block(index, subj):
+    return f"""=== SUBJECT {index} ===
+Subject Title: {subj['subject_title']}
+Program: {subj['program']}
+Semester: {subj['semester']}
+Prerequisites: {subj['prerequisites']}
+Credits: {subj['credits']}
+
+Overall Subject Aim:
+{subj['aim']}
+{format_units(subj['units'])}
+"""
+
+
+def build_batch_prompt(batch):
+    blocks = "".join(subject_block(idx, subj) for idx, subj in enumerate(batch, start=1))
+    return BATCH_INSTRUCTIONS.format(count=len(batch)) + blocks
+
+
+def plan_batches(subjects, token_budget, max_batch_size=20):
+    """Greedily pack subjects into batches whose estimated prompt plus answer fits token_budget."""
+    fixed = estimate_tokens(BATCH_INSTRUCTIONS)
+    batch, used = [], fixed
+    for subj in subjects:
+        cost = estimate_tokens(subject_block(len(batch) + 1, subj)) + OUTPUT_TOKENS_PER_SUBJECT
+        if batch and (used + cost > token_budget or len(batch) >= max_batch_size):
+            yield batch
+            batch, used = [], fixed
+        batch.append(subj)
+        used += cost
+    if batch:
+        yield batch
+
+
+def split_batch_response(text):
+    """Split a batched response into {subject number: section text}."""
+    sections = {}
+    matches = list(SUBJECT_MARKER.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        sections.setdefault(int(match.group(1)), text[match.end():end])
+    return sections
+
+
+def process_batch(batch, model, cache):
+    """Generate a whole batch in one request and save each subject's PDF.
+
+    Subjects whose section is missing or does not parse are retried on their own
+    with process_subject. Returns (filenames, error) pairs in batch order.
+    """
+    titles = ", ".join(subj["subject_title"] for subj in batch)
+    print(f"\n📦 GENERATING BATCH OF {len(batch)}: {titles}")
+
+    try:
+        sections = split_batch_response(cache.generate(model, build_batch_prompt(batch)))
+    except Exception as e:
+        print(f"⚠️ Batch request failed ({e}). Retrying its subjects individually.")
+        sections = {}
+
+    results = []
+    for idx, subj in enumerate(batch, start=1):
+        try:
+            section = sections.get(idx, "")
+            course_outcomes, program_outcomes = parse_outcomes(section)
+            if course_outcomes or program_outcomes:
+                journal.mark(subj, "generated")
+                course_outcomes, program_outcomes = repair_outcomes(subj, model, cache, course_outcomes, program_outcomes)
+                store.record(subj, model.model_name, section, course_outcomes, program_outcomes)
+                journal.mark(subj, "parsed", model=model.model_name)
+                results.append((save_outcomes(subj, course_outcomes, program_outcomes), None))
+            else:
+                print(f"⚠️ No usable section for {subj['subject_title']} in batch. Retrying on its own.")
+                results.append((process_subject(subj, model, cache), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def run_batched(subjects, model, cache, token_budget, max_in_flight=4, max_batch_size=20):
+    """Batched counterpart of run_concurrently over process_subject; results stay in input order."""
+    batches = list(plan_batches(subjects, token_budget, max_batch_size))
+    results = []
+
+    def traced_batch(batch):
+        with telemetry.recorder().subject(f"batch of {len(batch)}: {batch[0]['subject_title']}", count=len(batch)):
+            return process_batch(batch, model, cache)
+
+    outcomes = run_concurrently(batches, traced_batch, max_in_flight=max_in_flight)
+    for batch, (batch_results, error) in zip(batches, outcomes):
+        results.extend(batch_results if error is None else [(None, error)] * len(batch))
+    return results
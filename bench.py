@@ -0,0 +1,224 @@
+"""Benchmarks for the refine3 pipeline stages.
+
+Runs build_prompt, the CO/PO parser, the CO-PO articulation matrix, create_pdf,
+the HTML/Markdown/JSON renderers and a full end-to-end run against FakeBackend
+over synthetic catalogs, and writes throughput, p50/p95 latency and peak traced
+memory per stage and size to a JSON results file.
+
+    python bench.py --sizes 10 1000 --output bench_results.json
+    python bench.py --baseline bench_results.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from articulation import articulation_matrix
+from backends import FakeBackend, fake_outcomes
+from cache import ResponseCache
+from cli import STARTUP_BUDGET_MS
+from engine import run_concurrently
+from refine3 import build_prompt, create_pdf, parse_outcomes, process_subject
+from renderers import RENDERERS
+from telemetry import percentile
+
+STAGES = ["build_prompt", "parse", "articulation", "create_pdf", "render_text", "end_to_end", "startup"]
+
+# Formats timed together by the render_text stage
+TEXT_FORMATS = ["html", "md", "json"]
+
+# Process launches per size for the startup stage
+STARTUP_RUNS = 10
+BLOOM_LEVELS = ["Remembering", "Understanding", "Applying", "Analyzing", "Evaluating", "Creating"]
+TOPICS = ["Foundations", "Algorithms", "Architecture", "Protocols", "Optimization", "Security", "Modeling", "Systems", "Analysis", "Design"]
+
+
+def synthetic_subjects(n, seed=0):
+    """Yield n subject dicts shaped like refine3.subjects."""
+    rng = random.Random(seed)
+    for i in range(n):
+        title = f"{rng.choice(TOPICS)} of Computing {i}"
+        yield {
+            "subject_title": title,
+            "program": "B.Tech in Computer Science",
+            "semester": f"{rng.randint(1, 8)}th Semester",
+            "prerequisites": ", ".join(rng.sample(TOPICS, 2)),
+            "credits": "3 Lecture Hours, 1 Tutorial, 2 Practical",
+            "aim": f"To enable students to understand and apply {title.lower()} in real-world settings.",
+            "units": [
+                {
+                    "title": f"{rng.choice(TOPICS)} {u}",
+                    "focus": ", ".join(rng.sample(TOPICS, 3)),
+                    "outcome_focus": f"Apply {rng.choice(TOPICS).lower()} techniques",
+                    "blooms_levels": rng.sample(BLOOM_LEVELS, rng.randint(1, 2)),
+                }
+                for u in range(1, 6)
+            ],
+            "program_goals": "To produce graduates capable of solving practical computing problems.",
+            "graduate_attributes": rng.sample(TOPICS, 4),
+        }
+
+
+def measure(items, fn):
+    """Call fn on every item, returning per-call latencies, wall time and peak traced memory."""
+    latencies = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, wall, peak
+
+
+def summarize(stage, size, latencies, wall, peak):
+    ordered = sorted(latencies)
+    return {
+        "stage": stage,
+        "size": size,
+        "wall_s": wall,
+        "throughput_per_s": len(latencies) / wall if wall > 0 else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        "peak_mem_kb": peak / 1024,
+    }
+
+
+def run_stage(stage, subjects, workdir, args):
+    if stage == "build_prompt":
+        return measure(subjects, lambda s: build_prompt(**s))
+
+    if stage == "parse":
+        texts = [fake_outcomes(build_prompt(**s)) for s in subjects]
+        return measure(texts, parse_outcomes)
+
+    if stage == "articulation":
+        outcomes = [parse_outcomes(fake_outcomes(build_prompt(**s))) for s in subjects]
+        return measure(outcomes, lambda pair: articulation_matrix(*pair))
+
+    if stage == "create_pdf":
+        def render(s):
+            course_outcomes, program_outcomes = parse_outcomes(fake_outcomes(build_prompt(**s)))
+            data = dict(s, course_outcomes=course_outcomes, program_outcomes=program_outcomes)
+            create_pdf(data, os.path.join(workdir, "bench.pdf"))
+        return measure(subjects, render)
+
+    if stage == "render_text":
+        def render(s):
+            course_outcomes, program_outcomes = parse_outcomes(fake_outcomes(build_prompt(**s)))
+            data = dict(s, course_outcomes=course_outcomes, program_outcomes=program_outcomes)
+            for fmt in TEXT_FORMATS:
+                RENDERERS[fmt].render(data, os.path.join(workdir, f"bench.{fmt}"))
+        return measure(subjects, render)
+
+    if stage == "end_to_end":
+        model = FakeBackend(latency=args.fake_latency, seed=0)
+        cache = ResponseCache(path=os.path.join(workdir, "cache.sqlite"), mode="off")
+        latencies = []
+
+        def timed(s):
+            t0 = time.perf_counter()
+            process_subject(s, model, cache)
+            latencies.append(time.perf_counter() - t0)
+
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                _, wall, peak = measure([subjects], lambda batch: run_concurrently(batch, timed, max_in_flight=args.max_in_flight))
+        finally:
+            os.chdir(cwd)
+        return latencies, wall, peak
+
+    if stage == "startup":
+        # Full process launch of a dry run, which must never import reportlab or genai
+        cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+        env = dict(os.environ, MODEL_BACKEND="fake", MANIFEST_PATH=os.path.join(workdir, "manifest.json"))
+        command = [sys.executable, cli, "generate", "--dry-run"]
+        runs = range(min(len(subjects), STARTUP_RUNS))
+        return measure(runs, lambda _: subprocess.run(command, env=env, cwd=workdir, stdout=subprocess.DEVNULL, check=True))
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of results against baseline."""
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["stage"], r["size"]))
+        if old is None:
+            continue
+        if r["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{r['stage']}[{r['size']}] throughput {old['throughput_per_s']:.1f} -> {r['throughput_per_s']:.1f}/s")
+        if r["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{r['stage']}[{r['size']}] p95 {old['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+        if r["peak_mem_kb"] > old["peak_mem_kb"] * (1 + tolerance):
+            regressions.append(f"{r['stage']}[{r['size']}] peak memory {old['peak_mem_kb']:.0f} -> {r['peak_mem_kb']:.0f} KB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CO/PO generation pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    parser.add_argument("--fake-latency", default="constant:0", help="FakeBackend latency spec for end_to_end")
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            subjects = list(synthetic_subjects(size, seed=args.seed))
+            for stage in args.stages:
+                latencies, wall, peak = run_stage(stage, subjects, workdir, args)
+                row = summarize(stage, size, latencies, wall, peak)
+                results.append(row)
+                print(f"{stage:>12} n={size:<6} {row['throughput_per_s']:10.1f}/s  p50 {row['p50_ms']:8.3f} ms  p95 {row['p95_ms']:8.3f} ms  peak {row['peak_mem_kb']:10.0f} KB")
+                if stage == "startup" and row["p50_ms"] > STARTUP_BUDGET_MS:
+                    print(f"⚠️ CLI startup p50 {row['p50_ms']:.0f} ms is over the {STARTUP_BUDGET_MS} ms budget")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "args": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📊 Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import telemetry
+
+
+class ResponseCache:
+    """On-disk cache of generate_content responses, keyed by prompt, model and settings.
+
+    mode is "on" (read and write), "off" (bypass entirely) or "refresh" (always call
+    the model and overwrite the stored entry). Entries older than ttl seconds are
+    treated as misses, and the least recently used entries are evicted once the
+    stored text exceeds max_bytes. Concurrent misses on the same key share one
+    model call: the first caller makes it and the others wait for its answer.
+    """
+
+    def __init__(self, path=".gemini_cache.sqlite", max_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600, mode="on"):
+        if mode not in ("on", "off", "refresh"):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("GEMINI_CACHE_PATH", ".gemini_cache.sqlite"),
+            max_bytes=int(float(os.getenv("GEMINI_CACHE_MAX_MB", "256")) * 1024 * 1024),
+            ttl=float(os.getenv("GEMINI_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+            mode=os.getenv("GEMINI_CACHE", "on"),
+        )
+
+    @staticmethod
+    def make_key(prompt, model_name, settings=None):
+        payload = json.dumps(
+            {"prompt": prompt, "model": model_name, "settings": settings or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            text, created = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return text
+
+    def put(self, key, text):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, text, size, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def generate(self, model, prompt, **settings):
+        """Return the response text for prompt, calling model.generate_content only on a miss."""
+        if self.mode == "off":
+            return model.generate_content(prompt, **settings).text
+
+        key = self.make_key(prompt, model.model_name, settings)
+        if self.mode == "on":
+            text = self.get(key)
+            if text is not None:
+                telemetry.recorder().add("cache_hits")
+                return text
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = Future()
+        if not leader:
+            telemetry.recorder().add("cache_coalesced")
+            return flight.result()
+
+        telemetry.recorder().add("cache_misses")
+        try:
+            text = model.generate_content(prompt, **settings).text
+            self.put(key, text)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stream(self, model, prompt, **settings):
+        """Yield response text chunks for prompt, streaming from the model only on a miss.
+
+        A hit yields the whole stored text as one chunk. A streamed response is
+        stored only once it has been consumed to the end, so an aborted stream
+        never leaves a partial entry behind.
+        """
+        key = self.make_key(prompt, model.model_name, settings)
+        if self.mode == "on":
+            text = self.get(key)
+            if text is not None:
+                telemetry.recorder().add("cache_hits")
+                yield text
+                return
+
+        if self.mode != "off":
+            telemetry.recorder().add("cache_misses")
+        parts = []
+        for chunk in model.generate_content(prompt, stream=True, **settings):
+            parts.append(chunk.text)
+            yield chunk.text
+        if self.mode != "off":
+            self.put(key, "".join(parts))
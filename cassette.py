@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+
+from backends import FIRST_CHUNK_FRACTION, FakeResponse, FakeUsage, estimate_tokens
+from cache import ResponseCache
+
+CASSETTE_PATH = os.getenv("CASSETTE", "cassettes/responses.jsonl")
+
+
+class CassetteMissError(LookupError):
+    """Raised by ReplayBackend for a prompt that was never recorded."""
+
+
+def interaction_key(prompt, model_name, settings):
+    settings = {name: value for name, value in settings.items() if name != "stream"}
+    return ResponseCache.make_key(prompt, model_name, settings)
+
+
+def cassette_model_name(path=CASSETTE_PATH):
+    """Model name of the first recorded interaction, or None for a missing or empty cassette."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                return json.loads(line)["model"]
+    return None
+
+
+class RecordingBackend:
+    """Passes calls through to backend and appends each prompt/response pair to a JSONL cassette."""
+
+    def __init__(self, backend, path=CASSETTE_PATH):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, prompt, settings, text, latency, usage=None):
+        entry = {
+            "key": interaction_key(prompt, self.model_name, settings),
+            "model": self.model_name,
+            "prompt": str(prompt),
+            "settings": {name: value for name, value in settings.items() if name != "stream"},
+            "text": text,
+            "latency_s": latency,
+            "usage": {
+                "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+                "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+            },
+            "recorded": time.time(),
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def _stream(self, prompt, settings, start):
+        parts = []
+        for chunk in self.backend.generate_content(prompt, stream=True, **settings):
+            parts.append(chunk.text)
+            yield chunk
+        # Only fully consumed streams are recorded
+        self._write(prompt, settings, "".join(parts), time.perf_counter() - start)
+
+    def generate_content(self, prompt, stream=False, **settings):
+        start = time.perf_counter()
+        if stream:
+            return self._stream(prompt, settings, start)
+        response = self.backend.generate_content(prompt, **settings)
+        self._write(prompt, settings, response.text, time.perf_counter() - start, getattr(response, "usage_metadata", None))
+        return response
+
+    def count_tokens(self, text):
+        return self.backend.count_tokens(text)
+
+
+class ReplayBackend:
+    """Serves responses from a cassette written by RecordingBackend.
+
+    latency is "original" (sleep for the recorded duration) or "zero". A prompt
+    with no recording raises CassetteMissError and is listed in missing, so
+    stale cassettes show up instead of silently calling the API.
+    """
+
+    def __init__(self, path=CASSETTE_PATH, latency="original", chunk_size=64):
+        if latency not in ("original", "zero"):
+            raise ValueError(f"Unknown replay latency: {latency}")
+        self.path = path
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.model_name = cassette_model_name(path) or "replay"
+        self.interactions = {}
+        self.replayed = 0
+        self.missing = []
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # Re-recorded prompts replay their latest response
+                        self.interactions[entry["key"]] = entry
+
+    @classmethod
+    def from_env(cls):
+        return cls(path=CASSETTE_PATH, latency=os.getenv("REPLAY_LATENCY", "original"))
+
+    def _lookup(self, prompt, settings):
+        entry = self.interactions.get(interaction_key(prompt, self.model_name, settings))
+        with self._lock:
+            if entry is None:
+                self.missing.append(str(prompt))
+            else:
+                self.replayed += 1
+        if entry is None:
+            lines = [line.strip() for line in str(prompt).splitlines() if line.strip()]
+            label = next((line for line in lines if line.startswith("Subject Title:")), lines[0] if lines else "")
+            print(f"⚠️ No recorded response in {self.path} for prompt ({label[:80]})")
+            raise CassetteMissError(f"prompt not in cassette {self.path}")
+        return entry
+
+    def _stream(self, text, delay):
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        for idx, chunk in enumerate(chunks):
+            if idx:
+                time.sleep(delay / (len(chunks) - 1))
+            yield FakeResponse(chunk)
+
+    def generate_content(self, prompt, stream=False, **settings):
+        entry = self._lookup(prompt, settings)
+        delay = entry["latency_s"] if self.latency == "original" else 0.0
+        usage = FakeUsage(entry["usage"]["prompt_token_count"], entry["usage"]["candidates_token_count"])
+        if stream:
+            time.sleep(delay * FIRST_CHUNK_FRACTION)
+            return self._stream(entry["text"], delay * (1 - FIRST_CHUNK_FRACTION))
+        time.sleep(delay)
+        return FakeResponse(entry["text"], usage)
+
+    def count_tokens(self, text):
+        return estimate_tokens(text)
+
+    def summary(self):
+        return f"📼 Replayed {self.replayed} response(s) from {self.path}, {len(self.missing)} prompt(s) not recorded"
@@ -0,0 +1,168 @@
+import re
+import time
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+from refine3 import stylesheet, subject_story
+from renderers import atomic_write
+
+# Subjects' flowables are pulled from the store whenever fewer than this many are queued
+LOW_WATER = 64
+
+
+def catalog_filename(program):
+    return f"{re.sub(r'[^A-Za-z0-9]+', '_', program).strip('_')}_Catalog.pdf"
+
+
+def semester_key(semester):
+    # "2nd Semester" before "10th Semester"
+    match = re.search(r"\d+", semester)
+    return (int(match.group()) if match else float("inf"), semester)
+
+
+class FlowableStream(list):
+    """Story list that refills itself from an iterator of flowable chunks.
+
+    The document builder deletes flowables from the front as it lays them out
+    and checks len() before each one, so topping the list up there keeps only
+    a few subjects' flowables alive at any time.
+    """
+
+    def __init__(self, chunks, low_water=LOW_WATER):
+        super().__init__()
+        self._chunks = iter(chunks)
+        self.low_water = low_water
+
+    def __len__(self):
+        while list.__len__(self) < self.low_water:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self.extend(chunk)
+        return list.__len__(self)
+
+
+class TocEntry(Flowable):
+    """One contents line whose page number is a form filled in when the catalog is saved."""
+
+    def __init__(self, text, key, level, style):
+        super().__init__()
+        self.text = text
+        self.key = key
+        self.level = level
+        self.style = style
+
+    def wrap(self, avail_width, avail_height):
+        self.width = avail_width
+        return avail_width, self.style.leading
+
+    def draw(self):
+        canv = self.canv
+        indent = 18 * self.level
+        font = self.style.fontName if self.level else "Helvetica-Bold"
+        canv.setFont(font, self.style.fontSize)
+        canv.drawString(indent, 2, self.text)
+        canv.saveState()
+        canv.translate(self.width, 2)
+        canv.doForm(f"toc-{self.key}")
+        canv.restoreState()
+        canv.linkRect("", self.key, (indent, 0, self.width, self.style.leading), relative=1)
+
+
+class CatalogCanvas(Canvas):
+    """Canvas that draws every TOC page number as a form once all pages are known."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.toc_keys = []
+        self.toc_pages = {}
+
+    def save(self):
+        for key in self.toc_keys:
+            self.beginForm(f"toc-{key}", lowerx=-60, lowery=-4, upperx=0, uppery=16)
+            self.setFont("Helvetica", 10)
+            self.drawRightString(0, 0, str(self.toc_pages.get(key, "?")))
+            self.endForm()
+        super().save()
+
+
+class CatalogTemplate(SimpleDocTemplate):
+    """Adds an outline entry (and records the page) for every flowable tagged with a bookmark."""
+
+    def afterFlowable(self, flowable):
+        bookmark = getattr(flowable, "bookmark", None)
+        if bookmark is None:
+            return
+        key, title, level = bookmark
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(title, key, level=level, closed=level == 0)
+        self.canv.toc_pages[key] = self.page
+
+
+def tagged(flowable, key, title, level):
+    flowable.bookmark = (key, title, level)
+    return flowable
+
+
+def build_catalog(outcomes, program, filename=None, model_name=None):
+    """Write one PDF for every stored subject of program and return (filename, subject count).
+
+    Semesters are in numeric order, each starting on a new page and each
+    subject on its own page. The PDF has an outline (semester > subject) and a
+    clickable table of contents. Subjects are loaded from the store one at a
+    time as layout reaches them, so memory does not grow with the flowables
+    of the whole catalog; only the compressed pages and the small index do.
+    """
+    styles = stylesheet()
+    filename = filename or catalog_filename(program)
+    index = sorted(outcomes.catalog_index(program, model_name), key=lambda row: (semester_key(row["semester"]), row["subject_title"]))
+    semesters = {}
+    for row in index:
+        semesters.setdefault(row["semester"], []).append(row)
+
+    def canvasmaker(*args, **kwargs):
+        canv = CatalogCanvas(*args, **kwargs)
+        canv.toc_keys = [f"sem{idx}" for idx in range(len(semesters))] + [f"sub{row['id']}" for row in index]
+        return canv
+
+    def front_matter():
+        yield [
+            Spacer(1, 180),
+            Paragraph(program, styles["Title"]),
+            Paragraph("Program Catalog", styles["Heading2"]),
+            Spacer(1, 12),
+            Paragraph(f"{len(index)} subject(s) across {len(semesters)} semester(s)", styles["Normal"]),
+            Paragraph(time.strftime("Generated %d %B %Y"), styles["Normal"]),
+            PageBreak(),
+            Paragraph("Contents", styles["Heading1"]),
+        ]
+        for idx, (semester, rows) in enumerate(semesters.items()):
+            yield [TocEntry(semester, f"sem{idx}", 0, styles["Normal"])]
+            yield [TocEntry(row["subject_title"], f"sub{row['id']}", 1, styles["Normal"]) for row in rows]
+
+    def body():
+        for idx, (semester, rows) in enumerate(semesters.items()):
+            yield [PageBreak(), tagged(Paragraph(semester, styles["Heading1"]), f"sem{idx}", semester, 0)]
+            for position, row in enumerate(rows):
+                story = subject_story(outcomes.outcome_data(outcomes.subject(row["id"])), styles)
+                story[0] = tagged(story[0], f"sub{row['id']}", row["subject_title"], 1)
+                yield story if position == 0 else [PageBreak()] + story
+
+    def chunks():
+        yield from front_matter()
+        yield from body()
+
+    def footer(canv, doc):
+        canv.saveState()
+        canv.setFont("Helvetica", 8)
+        canv.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"{program} · page {doc.page}")
+        canv.restoreState()
+
+    def write(path):
+        doc = CatalogTemplate(path, pagesize=letter, title=f"{program} Catalog")
+        doc.build(FlowableStream(chunks()), onFirstPage=footer, onLaterPages=footer, canvasmaker=canvasmaker)
+
+    atomic_write(filename, write)
+    return filename, len(index)
@@ -0,0 +1,362 @@
+"""Command line entry point for the CO/PO syllabus generator.
+
+    python cli.py generate [--catalog PATH ...] [--force] [--dry-run] [--render-only] [--resume]
+    python cli.py render [--program P] [--semester S] [--subject T] [--model M] [--format F]
+    python cli.py outcomes [--semester S] [--bloom LEVEL] [--unit N] ...
+    python cli.py catalog [--program P] [--model M] [--output PATH]
+    python cli.py serve [--host H] [--port N]
+    python cli.py models [--refresh]
+
+Only argparse and the standard library are imported up front. refine3
+(reportlab) and google.generativeai are loaded by the commands that need
+them, so --help, --dry-run and --render-only never touch the API client.
+"""
+import argparse
+import os
+import sys
+
+# Wall-clock budget for `cli.py generate --dry-run` from process launch to exit,
+# checked by `bench.py --stages startup`
+STARTUP_BUDGET_MS = 300
+
+
+def model_names_for(backend_name, check=True):
+    """Configured model names, cheapest first, validated against the catalog for Gemini."""
+    import refine3
+    from backends import configured_model_name
+
+    # MODEL_TIERS routes across several models, cheapest first
+    model_names = refine3.MODEL_TIERS or [configured_model_name(backend_name)]
+    if backend_name == "gemini" and check:
+        from model_catalog import validate_model_name
+        for model_name in model_names:
+            validate_model_name(model_name)
+    return model_names
+
+
+def open_model(model_names, backend_name, summaries):
+    """The model every subject goes through: one tier, or a ModelRouter over several.
+
+    Wrappers that report on the run are appended to summaries.
+    """
+    import threading
+    import refine3
+    from backends import get_backend
+    from ratelimit import RateLimitedModel
+
+    # Every tier draws on one MAX_IN_FLIGHT budget, including calls made from nested fan-outs
+    slots = threading.BoundedSemaphore(refine3.MAX_IN_FLIGHT)
+
+    def build_model(model_name):
+        # Configure model backend (MODEL_BACKEND=gemini|fake|replay) behind the quota scheduler
+        backend = get_backend(model_name=model_name)
+        if backend_name == "replay":
+            summaries.append(backend)
+        if refine3.SHARED_PREFIX:
+            from context_cache import SharedPrefixBackend
+            backend = SharedPrefixBackend(backend)
+            summaries.append(backend)
+        tier = RateLimitedModel(backend, refine3.REQUESTS_PER_MINUTE, refine3.TOKENS_PER_MINUTE, max_retries=refine3.MAX_RETRIES, slots=slots)
+        if refine3.HEDGE_PERCENTILE:
+            from hedging import HedgedModel
+            tier = HedgedModel(tier, refine3.HEDGE_PERCENTILE, refine3.HEDGE_BUDGET)
+            summaries.append(tier)
+        return tier
+
+    if len(model_names) > 1:
+        from routing import ModelRouter
+        router = ModelRouter([build_model(model_name) for model_name in model_names], refine3.MODEL_TIER_COSTS or None)
+        summaries.append(router)
+        return router
+    return build_model(model_names[0] if refine3.MODEL_TIERS else None)
+
+
+def generate(args):
+    import refine3
+    from backends import offline_backend
+    from cache import ResponseCache
+    from loader import chunks
+    from manifest import Manifest, print_plan
+    from journal import load as load_journal, resume_action
+    from ratelimit import run_with_requeue
+    from renderers import output_filenames, write_outputs
+    import journal
+    import store
+    import telemetry
+
+    try:
+        formats = refine3.output_formats()
+    except ValueError as e:
+        raise SystemExit(f"OUTPUT_FORMATS: {e}")
+    try:
+        refine3.check_modes()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    if args.catalog:
+        from loader import iter_subjects
+        source = iter_subjects(args.catalog)
+    else:
+        source = refine3.subjects
+
+    backend_name = os.getenv("MODEL_BACKEND", "gemini")
+    model_names = model_names_for(backend_name, check=not (args.dry_run or args.render_only or args.skip_model_check))
+
+    if args.resume and not refine3.JOURNAL_PATH:
+        raise SystemExit("--resume needs a journal; JOURNAL_PATH is empty")
+    # Read before this run starts appending to the same file
+    resumed = load_journal(refine3.JOURNAL_PATH) if args.resume else {}
+
+    manifest = Manifest.load(refine3.MANIFEST_PATH)
+    recorder = telemetry.configure(None if args.dry_run else refine3.TELEMETRY_DIR or None)
+    outcomes = store.configure(None if args.dry_run else refine3.OUTCOME_STORE)
+    journal.configure(None if args.dry_run else refine3.JOURNAL_PATH or None, recorder.run_id)
+    mode = "structured" if refine3.STRUCTURED else "fanout" if refine3.FAN_OUT_UNITS else "text"
+    force = args.force or args.render_only
+    model = cache = None
+    summaries = []  # wrappers that report on the run at the end
+    total_todo = total_up_to_date = 0
+
+    def resume(subj, digest):
+        """Finish subj from the journal without calling the API; False if it has to be generated."""
+        entry = resumed.get(subj["subject_title"])
+        action = resume_action(entry, digest, output_filenames(subj, formats))
+        if action == "skip":
+            filenames = entry["outputs"]
+        elif action == "render" and outcomes is not None:
+            rows = outcomes.subjects(subj["program"], subj["semester"], subj["subject_title"], entry["model"])
+            if not rows:
+                return False
+            filenames = write_outputs(outcomes.outcome_data(rows[0]), formats)
+            journal.mark(subj, "rendered", outputs=filenames)
+        else:
+            return False
+        manifest.record(subj, digest, filenames)
+        print(f"⏩ Resumed ({entry['state']} in run {entry['run']}): {', '.join(filenames)}")
+        return True
+
+    try:
+        for chunk in chunks(source, refine3.CHUNK_SIZE):
+            todo, up_to_date = manifest.plan(
+                chunk, "+".join(model_names), refine3.PROMPT_VERSION, mode=mode, force=force,
+                outputs=lambda subj: output_filenames(subj, formats),
+            )
+            total_todo += len(todo)
+            total_up_to_date += len(up_to_date)
+            if args.dry_run:
+                print_plan(todo, up_to_date)
+                continue
+            if resumed:
+                todo = [(subj, digest, reason) for subj, digest, reason in todo if not resume(subj, digest)]
+
+            if model is None and todo:
+                cache = ResponseCache.from_env()
+                if args.render_only:
+                    # Serve every subject from the response cache; misses fail instead of calling the API
+                    cache.mode = "on"
+                    model = offline_backend()
+                else:
+                    model = open_model(model_names, backend_name, summaries)
+
+            for subj, _ in up_to_date:
+                print(f"⏭️ Up to date: {', '.join(output_filenames(subj, formats))}")
+
+            for subj, digest, _ in todo:
+                journal.mark(subj, "queued", hash=digest)
+            pending = [subj for subj, _, _ in todo]
+            rounds = 0 if args.render_only else refine3.REQUEUE_ROUNDS
+            results = run_with_requeue(pending, lambda batch: refine3.run_subjects(batch, model, cache), rounds=rounds)
+            for (subj, digest, _), (filenames, error) in zip(todo, results):
+                if error is None:
+                    manifest.record(subj, digest, filenames)
+                    print(f"✅ Saved: {', '.join(filenames)}")
+                else:
+                    journal.mark(subj, "failed", reason=str(error))
+                    print(f"❌ Error generating content for {subj['subject_title']}: {error}")
+            manifest.save()
+    finally:
+        # Keep whatever finished, even when interrupted; the journal has the rest
+        if not args.dry_run:
+            manifest.save()
+        journal.configure(None)
+
+    if args.dry_run:
+        print(f"\n{total_todo} to regenerate, {total_up_to_date} up to date")
+    for wrapper in summaries:
+        print(wrapper.summary())
+    if model is not None:
+        print(recorder.summary())
+        metrics = recorder.write_prometheus()
+        if metrics:
+            print(f"📊 Telemetry: {metrics} (events in {os.path.splitext(metrics)[0]}.jsonl)")
+    recorder.close()
+    store.configure(None)
+    return 0
+
+
+def serve(args):
+    import refine3
+    from cache import ResponseCache
+    from service import serve as run_service
+    import journal
+    import store
+    import telemetry
+
+    try:
+        refine3.output_formats()
+    except ValueError as e:
+        raise SystemExit(f"OUTPUT_FORMATS: {e}")
+    backend_name = os.getenv("MODEL_BACKEND", "gemini")
+    model_names = model_names_for(backend_name, check=not args.skip_model_check)
+    recorder = telemetry.configure(refine3.TELEMETRY_DIR or None)
+    store.configure(refine3.OUTCOME_STORE)
+    journal.configure(refine3.JOURNAL_PATH or None, recorder.run_id)
+    summaries = []
+    model = open_model(model_names, backend_name, summaries)
+    try:
+        run_service(model, ResponseCache.from_env(), args.host, args.port, workers=refine3.MAX_IN_FLIGHT)
+    except KeyboardInterrupt:
+        print("\n⏹️ Service stopped.")
+    finally:
+        journal.configure(None)
+        for wrapper in summaries:
+            print(wrapper.summary())
+        print(recorder.summary())
+        metrics = recorder.write_prometheus()
+        if metrics:
+            print(f"📊 Telemetry: {metrics} (events in {os.path.splitext(metrics)[0]}.jsonl)")
+        recorder.close()
+        store.configure(None)
+    return 0
+
+
+def open_store():
+    import refine3
+    from store import OutcomeStore
+
+    if not refine3.OUTCOME_STORE or not os.path.exists(refine3.OUTCOME_STORE):
+        raise SystemExit(f"No outcome store at {refine3.OUTCOME_STORE!r}; run `cli.py generate` first")
+    return OutcomeStore(refine3.OUTCOME_STORE)
+
+
+def render(args):
+    from renderers import parse_formats, write_outputs
+    import refine3
+
+    try:
+        formats = parse_formats(args.format or refine3.OUTPUT_FORMATS)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    outcomes = open_store()
+    rows = outcomes.subjects(args.program, args.semester, args.subject, args.model)
+    if not rows:
+        print("No stored subjects match.")
+        return 1
+    for row in rows:
+        filenames = write_outputs(outcomes.outcome_data(row), formats)
+        print(f"✅ Rendered from store: {', '.join(filenames)} ({row['model_name']})")
+    return 0
+
+
+def build_catalogs(args):
+    import time
+    from catalog import build_catalog
+
+    outcomes = open_store()
+    programs = [args.program] if args.program else outcomes.programs()
+    if args.output and len(programs) > 1:
+        raise SystemExit("--output needs --program when the store holds several programs")
+    for program in programs:
+        start = time.perf_counter()
+        filename, count = build_catalog(outcomes, program, args.output, args.model)
+        if not count:
+            print(f"No stored subjects for {program!r}.")
+            return 1
+        print(f"📚 Catalog: {filename} ({count} subject(s) in {time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+def query_outcomes(args):
+    import time
+
+    outcomes = open_store()
+    start = time.perf_counter()
+    rows = outcomes.course_outcomes(args.program, args.semester, args.subject, args.model, args.bloom, args.unit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for row in rows:
+        unit = f"Unit {row['unit']}" if row["unit"] is not None else "-"
+        print(f"{row['semester']} · {row['subject_title']} · {unit} · {row['bloom_level'] or '?'} · {row['text']}")
+    print(f"\n{len(rows)} CO(s) in {elapsed:.1f} ms")
+    return 0
+
+
+def add_store_filters(parser):
+    parser.add_argument("--program", help="exact program name")
+    parser.add_argument("--semester", help='exact semester, e.g. "5th Semester"')
+    parser.add_argument("--subject", help="exact subject title")
+    parser.add_argument("--model", help="model name the subject was generated with")
+
+
+def models(args):
+    from model_catalog import list_models
+
+    print("Available models:")
+    for model in list_models(refresh=args.refresh):
+        print(model["name"])
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate CO/PO syllabus PDFs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="generate syllabus PDFs")
+    gen.add_argument("--force", action="store_true", help="regenerate every subject, even if unchanged")
+    gen.add_argument("--dry-run", action="store_true", help="only report which subjects would be regenerated")
+    gen.add_argument("--render-only", action="store_true", help="re-render every subject from cached responses without calling the API")
+    gen.add_argument("--resume", action="store_true", help="skip or only re-render subjects the journal shows an interrupted run already finished")
+    gen.add_argument("--catalog", nargs="+", metavar="PATH", help="JSONL/CSV/YAML catalog files or directories to read subjects from")
+    gen.add_argument("--skip-model-check", action="store_true", help="do not validate GEMINI_MODEL against the cached model catalog")
+    gen.set_defaults(handler=generate)
+
+    ren = commands.add_parser("render", help="re-render syllabi from the outcome store without calling the API")
+    add_store_filters(ren)
+    ren.add_argument("--format", help="comma-separated output formats: pdf, html, md, json, docx (default OUTPUT_FORMATS)")
+    ren.set_defaults(handler=render)
+
+    out = commands.add_parser("outcomes", help="query stored course outcomes")
+    add_store_filters(out)
+    out.add_argument("--bloom", help="Bloom level, e.g. Evaluating")
+    out.add_argument("--unit", type=int, help="unit number")
+    out.set_defaults(handler=query_outcomes)
+
+    cat = commands.add_parser("catalog", help="build one catalog PDF per program from the outcome store")
+    cat.add_argument("--program", help="exact program name (default: every stored program)")
+    cat.add_argument("--model", help="only subjects generated with this model")
+    cat.add_argument("--output", help="catalog PDF path (default <Program>_Catalog.pdf)")
+    cat.set_defaults(handler=build_catalogs)
+
+    srv = commands.add_parser("serve", help="run a local HTTP service that queues generation jobs from every department")
+    srv.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    srv.add_argument("--port", type=int, default=8765, help="port to listen on (default 8765)")
+    srv.add_argument("--skip-model-check", action="store_true", help="do not validate GEMINI_MODEL against the cached model catalog")
+    srv.set_defaults(handler=serve)
+
+    mod = commands.add_parser("models", help="list available Gemini models (cached)")
+    mod.add_argument("--refresh", action="store_true", help="ignore the cached catalog and refetch it")
+    mod.set_defaults(handler=models)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        if args.command == "generate":
+            print("\n⏹️ Interrupted. Run `cli.py generate --resume` to pick up where this run stopped.")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
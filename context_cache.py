@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import journal
+import store
+from refine3 import format_units, parse_outcomes, save_outcomes
+from renderers import atomic_write
+from repair import repair_outcomes
+
+# Gemini only accepts cached contents above a minimum size; smaller prefixes
+# are sent as a system instruction instead
+MIN_CACHED_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "32768"))
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL_MINUTES", "60")) * 60
+CONTEXT_CACHE_INDEX = os.getenv("CONTEXT_CACHE_INDEX", ".context_cache.json")
+
+# Static part of refine3.build_prompt, identical for every subject
+SYSTEM_INSTRUCTION = """You are an education expert helping generate course and program outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+Each request gives you one subject's title, program, aim and units.
+
+### Instructions:
+Generate exactly 2–3 **Course Outcomes (COs)** per unit, numbered like:
+- CO1: ...
+- CO2: ...
+- ...
+
+Also, generate exactly 6 **Program Outcomes (POs)** based on the program goals and graduate attributes, numbered like:
+- PO1: ...
+- PO2: ...
+- ...
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with Bloom's Taxonomy
+- Written in concise, academic language
+
+Output only two sections:
+---
+### Course Outcomes
+- CO1: ...
+- CO2: ...
+...
+
+### Program Outcomes
+- PO1: ...
+- PO2: ...
+...
+---
+Do NOT include any other text or explanation.
+"""
+
+
+def build_payload(subject_title, program, semester, prerequisites, credits, aim, units, program_goals, graduate_attributes):
+    """Per-subject part of the prompt, sent alongside the shared SYSTEM_INSTRUCTION."""
+    graduate_attr_str = "\n".join(f"- {attr}" for attr in graduate_attributes)
+    return f"""Subject Title: {subject_title}
+Program: {program}
+Semester: {semester}
+Prerequisites: {prerequisites}
+Credits: {credits}
+
+Overall Subject Aim:
+{aim}
+{format_units(units)}
+Program Goals: {program_goals}
+
+Graduate Attributes:
+{graduate_attr_str}
+"""
+
+
+def _load_index():
+    if not os.path.exists(CONTEXT_CACHE_INDEX):
+        return {}
+    with open(CONTEXT_CACHE_INDEX, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_index(index):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+
+    atomic_write(CONTEXT_CACHE_INDEX, write)
+
+
+def _cached_content(model_name, instruction, digest):
+    """Reuse this instruction's CachedContent from an earlier run while it is valid, else create one."""
+    from google.generativeai import caching
+
+    index = _load_index()
+    entry = index.get(digest)
+    if entry and entry["expires"] > time.time() + 60:
+        try:
+            return caching.CachedContent.get(entry["name"])
+        except Exception:
+            pass  # expired or deleted server-side; create a fresh one
+
+    cached = caching.CachedContent.create(
+        model=model_name,
+        system_instruction=instruction,
+        ttl=CONTEXT_CACHE_TTL,
+        display_name=f"syllabus-prefix-{digest[:12]}",
+    )
+    index[digest] = {"name": cached.name, "expires": time.time() + CONTEXT_CACHE_TTL}
+    _save_index(index)
+    return cached
+
+
+class SharedPrefixBackend:
+    """Backend that registers SYSTEM_INSTRUCTION once and sends only per-subject payloads.
+
+    Only calls made with the shared_prefix=True setting get the prefix; every
+    other prompt (repairs, fan-outs, batches) already carries its full text
+    and goes to the wrapped backend unchanged. For Gemini the prefix becomes a
+    CachedContent when it is large enough to qualify, otherwise a system
+    instruction. Other backends get the prefix prepended to each payload.
+    model_name includes a hash of the prefix so response-cache keys change with it.
+    """
+
+    def __init__(self, backend, instruction=SYSTEM_INSTRUCTION):
+        digest = hashlib.sha256(f"{backend.model_name}\n{instruction}".encode("utf-8")).hexdigest()
+        self.backend = backend
+        self.instruction = instruction
+        self.model_name = f"{backend.model_name}+prefix-{digest[:12]}"
+        self.prefix_tokens = backend.count_tokens(instruction)
+        self.calls = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+        model = getattr(backend, "_model", None)
+        if model is None:
+            self.strategy = "inline"
+            self._model = None
+        else:
+            import google.generativeai as genai
+
+            if self.prefix_tokens >= MIN_CACHED_TOKENS:
+                self.strategy = "cached-content"
+                self._model = genai.GenerativeModel.from_cached_content(_cached_content(model.model_name, instruction, digest))
+            else:
+                self.strategy = "system-instruction"
+                self._model = genai.GenerativeModel(model.model_name, system_instruction=instruction)
+
+    def generate_content(self, payload, shared_prefix=False, **settings):
+        if not shared_prefix:
+            return self.backend.generate_content(payload, **settings)
+        if self._model is None:
+            response = self.backend.generate_content(f"{self.instruction}\n{payload}", **settings)
+        else:
+            response = self._model.generate_content(payload, **settings)
+
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.calls += 1
+            self.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+        return response
+
+    def count_tokens(self, text):
+        return self.backend.count_tokens(text)
+
+    def summary(self):
+        return (
+            f"💾 Shared prefix ({self.strategy}): {self.prefix_tokens} tokens registered once, "
+            f"{self.calls} calls, {self.cached_tokens} input tokens served from context cache"
+        )
+
+
+def process_subject_shared_prefix(subj, model, cache, save=save_outcomes):
+    """refine3.process_subject with only the per-subject payload sent per call."""
+    print(f"\n📘 GENERATING SYLLABUS FOR: {subj['subject_title']}")
+
+    # The setting travels through the rate limiter, hedging and routing to SharedPrefixBackend
+    text_output = cache.generate(model, build_payload(**subj), shared_prefix=True)
+    journal.mark(subj, "generated")
+    course_outcomes, program_outcomes = parse_outcomes(text_output)
+    course_outcomes, program_outcomes = repair_outcomes(subj, model, cache, course_outcomes, program_outcomes)
+    store.record(subj, model.model_name, text_output, course_outcomes, program_outcomes)
+    journal.mark(subj, "parsed", model=model.model_name)
+
+    return save(subj, course_outcomes, program_outcomes)
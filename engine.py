@@ -0,0 +1,27 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_concurrently(items, worker, max_in_flight=4):
+    """Run worker(item) for every item with at most max_in_flight calls running at once.
+
+    Returns a list of (result, error) pairs in the same order as items. An exception
+    raised for one item is stored as its error and does not stop the other items.
+    Workers run in a copy of the caller's context, so context variables such as
+    the current telemetry record carry over into the pool threads.
+    """
+    parent = contextvars.copy_context()
+
+    def guarded(item):
+        try:
+            return parent.copy().run(worker, item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        try:
+            return list(pool.map(guarded, items))
+        except KeyboardInterrupt:
+            # Drop queued items instead of working through them before exiting
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
@@ -0,0 +1,142 @@
+import re
+
+import journal
+import store
+from engine import run_concurrently
+from refine3 import format_units, generate_outcomes, parse_outcomes, save_outcomes
+
+OUTCOME_NUMBER = re.compile(r"^(CO|PO)\s*\d+\s*[:.\-]\s*")
+
+UNIT_PROMPT = """
+You are an education expert helping generate course outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+Subject Title: {subject_title}
+Program: {program}
+Semester: {semester}
+Prerequisites: {prerequisites}
+
+Overall Subject Aim:
+{aim}
+
+Generate Course Outcomes for this unit of the subject only:
+{unit}
+### Instructions:
+Generate exactly 2–3 **Course Outcomes (COs)** for this unit, numbered like:
+- CO1: ...
+- CO2: ...
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with the unit's Bloom's Taxonomy levels
+- Written in concise, academic language
+
+Output only this section:
+---
+### Course Outcomes
+- CO1: ...
+- CO2: ...
+---
+Do NOT include any other text or explanation.
+"""
+
+PROGRAM_PROMPT = """
+You are an education expert helping generate program outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+Subject Title: {subject_title}
+Program: {program}
+Semester: {semester}
+
+Overall Subject Aim:
+{aim}
+
+Program Goals: {program_goals}
+
+Graduate Attributes:
+{graduate_attributes}
+
+### Instructions:
+Generate exactly 6 **Program Outcomes (POs)** based on the program goals and graduate attributes, numbered like:
+- PO1: ...
+- PO2: ...
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with Bloom's Taxonomy
+- Written in concise, academic language
+
+Output only this section:
+---
+### Program Outcomes
+- PO1: ...
+- PO2: ...
+---
+Do NOT include any other text or explanation.
+"""
+
+
+def build_unit_prompt(subj, idx):
+    """Prompt for one unit; depends only on that unit and the shared subject context."""
+    # Keep the unit's own number so the answer stays stable when other units change
+    unit = format_units([subj["units"][idx - 1]]).replace("Unit 1:", f"Unit {idx}:", 1)
+    return UNIT_PROMPT.format(unit=unit, **subj)
+
+
+def build_program_prompt(subj):
+    graduate_attributes = "\n".join(f"- {attr}" for attr in subj["graduate_attributes"])
+    return PROGRAM_PROMPT.format(**dict(subj, graduate_attributes=graduate_attributes))
+
+
+def renumber(outcomes, prefix, start=1):
+    """Strip whatever numbering the model used and number outcomes sequentially from start."""
+    return [f"{prefix}{n}: {OUTCOME_NUMBER.sub('', outcome)}" for n, outcome in enumerate(outcomes, start=start)]
+
+
+def generate_fanned_out(subj, model, cache, max_in_flight=None):
+    """Generate each unit's COs and the subject's POs as separate concurrent calls.
+
+    Each call goes through the response cache on its own prompt, so editing one
+    unit only re-runs that unit. How many calls actually reach the API at once
+    is bounded by the model's shared call slots (RateLimitedModel), not by this
+    per-subject pool. The merged answer goes through the same validation and
+    repair as the text mode. Returns (unit_outcomes, course_outcomes,
+    program_outcomes) with COs renumbered CO1..COn across units.
+    """
+    from repair import repair_unit_outcomes
+
+    prompts = [build_unit_prompt(subj, idx) for idx in range(1, len(subj["units"]) + 1)]
+    prompts.append(build_program_prompt(subj))
+    answers = run_concurrently(prompts, lambda prompt: cache.generate(model, prompt), max_in_flight=max_in_flight or len(prompts))
+
+    for text, error in answers:
+        if error is not None:
+            raise error
+    journal.mark(subj, "generated")
+
+    unit_outcomes = []
+    numbered = 0
+    for idx, (unit, (text, _)) in enumerate(zip(subj["units"], answers), start=1):
+        cos, _ = parse_outcomes(text)
+        cos = renumber(cos, "CO", start=numbered + 1)
+        numbered += len(cos)
+        unit_outcomes.append({"unit": idx, "title": unit["title"], "course_outcomes": cos})
+    _, pos = parse_outcomes(answers[-1][0])
+
+    # Short units and POs are re-asked; an empty section repeats its cached answer and raises OutcomeError
+    unit_outcomes, course_outcomes, program_outcomes = repair_unit_outcomes(subj, model, cache, unit_outcomes, renumber(pos, "PO"))
+    store.record(subj, model.model_name, "\n\n".join(text for text, _ in answers), course_outcomes, program_outcomes, unit_outcomes)
+    journal.mark(subj, "parsed", model=model.model_name)
+    return unit_outcomes, course_outcomes, program_outcomes
+
+
+def process_subject_fanned_out(subj, model, cache, save=save_outcomes):
+    """Unit fan-out counterpart of refine3.process_subject."""
+    print(f"\n📘 GENERATING SYLLABUS FOR: {subj['subject_title']} ({len(subj['units'])} units in parallel)")
+
+    try:
+        unit_outcomes, course_outcomes, program_outcomes = generate_fanned_out(subj, model, cache)
+    except ValueError as e:
+        print(f"⚠️ Unit fan-out failed for {subj['subject_title']} ({e}). Falling back to a single prompt.")
+        unit_outcomes = None
+        course_outcomes, program_outcomes = generate_outcomes(subj, model, cache)
+
+    return save(subj, course_outcomes, program_outcomes, unit_outcomes)
@@ -0,0 +1,100 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from telemetry import percentile
+
+
+class HedgedModel:
+    """Wraps a backend so slow calls get a duplicate request.
+
+    Once min_samples latencies have been seen, a call still running after the
+    given percentile of the recent window is sent a second time and the first
+    answer to arrive wins. Hedges are capped at budget times the number of
+    calls so far, so at most e.g. 5% extra requests hit the quota. The losing
+    request cannot be aborted mid-flight; its result is discarded. Streaming
+    calls are passed through unhedged.
+    """
+
+    def __init__(self, model, percentile=95, budget=0.05, min_samples=20, window=200, max_workers=32):
+        self.model = model
+        self.model_name = model.model_name
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there is too little history."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            return percentile(sorted(self._latencies), self.percentile)
+
+    def _may_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _timed(self, prompt, settings):
+        start = time.perf_counter()
+        response = self.model.generate_content(prompt, **settings)
+        # Behind RateLimitedModel, sample the request itself rather than quota waits and retry backoff
+        last_attempt = getattr(self.model, "last_attempt_latency", None)
+        latency = last_attempt() if callable(last_attempt) else None
+        if latency is None:
+            latency = time.perf_counter() - start
+        with self._lock:
+            self._latencies.append(latency)
+        return response
+
+    def _submit(self, prompt, settings):
+        # Keep the caller's telemetry record for calls made from pool threads
+        return self._pool.submit(contextvars.copy_context().run, self._timed, prompt, settings)
+
+    def generate_content(self, prompt, **settings):
+        if settings.get("stream"):
+            return self.model.generate_content(prompt, **settings)
+
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(prompt, settings)
+
+        primary = self._submit(prompt, settings)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = self._submit(prompt, settings)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def summary(self):
+        share = self.hedges / self.calls * 100 if self.calls else 0
+        return f"🪃 Hedged {self.hedges} of {self.calls} calls ({share:.1f}%), hedge answered first {self.hedge_wins} time(s)"
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import time
+
+# Subject states in the order a successful run passes through them
+STATES = ["queued", "generated", "parsed", "rendered", "failed"]
+
+
+class Journal:
+    """Append-only JSONL log of each subject's state across runs.
+
+    Every line is one {"run", "ts", "subject", "state", ...} event, flushed as
+    soon as it is written, so a crash or Ctrl-C loses at most the line being
+    written. "queued" carries the subject's manifest hash, "parsed" the model
+    the stored outcomes came from, "rendered" the output files and "failed"
+    the reason.
+    """
+
+    def __init__(self, path, run_id=None):
+        self.path = path
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._log = open(path, "a", encoding="utf-8")
+
+    def mark(self, subj, state, **fields):
+        if state not in STATES:
+            raise ValueError(f"Unknown journal state: {state}")
+        line = json.dumps({"run": self.run_id, "ts": time.time(), "subject": subj["subject_title"], "state": state, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    def close(self):
+        with self._lock:
+            os.fsync(self._log.fileno())
+            self._log.close()
+
+
+def load(path):
+    """Latest state per subject title: {"hash", "state", "model", "outputs", "reason", "run"}.
+
+    A "queued" event starts a fresh entry, so states from an attempt with a
+    different hash never leak into the next one. A torn last line from a crash
+    is ignored.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            title = event["subject"]
+            if event["state"] == "queued":
+                entries[title] = {"hash": event.get("hash")}
+            entry = entries.setdefault(title, {"hash": None})
+            entry.update({field: value for field, value in event.items() if field not in ("subject", "ts")})
+    return entries
+
+
+def resume_action(entry, digest, outputs):
+    """What a resumed run still has to do for a subject: "skip", "render" or "generate".
+
+    outputs lists the files this run wants for the subject.
+    """
+    if entry is None or entry["hash"] != digest:
+        return "generate"
+    done = entry.get("outputs", [])
+    if entry["state"] == "rendered" and set(outputs) <= set(done) and all(os.path.exists(path) for path in done):
+        return "skip"
+    if entry["state"] in ("parsed", "rendered") and entry.get("model"):
+        # Outcomes are in the outcome store; only the files are missing
+        return "render"
+    return "generate"
+
+
+_journal = None
+
+
+def configure(path, run_id=None):
+    """Open the journal that mark() appends to; a falsy path disables it."""
+    global _journal
+    if _journal is not None:
+        _journal.close()
+    _journal = Journal(path, run_id) if path else None
+    return _journal
+
+
+def mark(subj, state, **fields):
+    # No-op unless a journal has been configured for this run
+    if _journal is not None:
+        _journal.mark(subj, state, **fields)
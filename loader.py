@@ -0,0 +1,185 @@
+import csv
+import inspect
+import itertools
+import json
+import os
+
+from refine3 import build_prompt
+
+SUBJECT_FIELDS = list(inspect.signature(build_prompt).parameters)
+UNIT_FIELDS = ["title", "focus", "outcome_focus", "blooms_levels"]
+LIST_FIELDS = ["graduate_attributes"]
+
+# Separator for list-valued cells in CSV catalogs
+CSV_LIST_SEPARATOR = ";"
+
+
+class RecordError(ValueError):
+    def __init__(self, path, line, message):
+        super().__init__(f"{path}:{line}: {message}")
+        self.path = path
+        self.line = line
+
+
+def validate_subject(record):
+    """Return None if record can be passed as build_prompt(**record), else a message."""
+    if not isinstance(record, dict):
+        return f"expected a mapping, got {type(record).__name__}"
+    missing = [field for field in SUBJECT_FIELDS if field not in record]
+    if missing:
+        return f"missing field(s): {', '.join(missing)}"
+    unknown = [field for field in record if field not in SUBJECT_FIELDS]
+    if unknown:
+        return f"unknown field(s): {', '.join(unknown)}"
+    for field in SUBJECT_FIELDS:
+        if field in LIST_FIELDS or field == "units":
+            continue
+        if not isinstance(record[field], str) or not record[field].strip():
+            return f"{field} must be a non-empty string"
+    if not isinstance(record["graduate_attributes"], list) or not all(isinstance(a, str) for a in record["graduate_attributes"]):
+        return "graduate_attributes must be a list of strings"
+    units = record["units"]
+    if not isinstance(units, list) or not units:
+        return "units must be a non-empty list"
+    for idx, unit in enumerate(units, start=1):
+        if not isinstance(unit, dict):
+            return f"unit {idx} must be a mapping"
+        missing = [field for field in UNIT_FIELDS if field not in unit]
+        if missing:
+            return f"unit {idx} missing field(s): {', '.join(missing)}"
+        levels = unit["blooms_levels"]
+        if not isinstance(levels, list) or not levels or not all(isinstance(level, str) for level in levels):
+            return f"unit {idx} blooms_levels must be a non-empty list of strings"
+    return None
+
+
+def _split_list(cell):
+    return [item.strip() for item in (cell or "").split(CSV_LIST_SEPARATOR) if item.strip()]
+
+
+def _read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, RecordError(path, line_no, f"invalid JSON ({e.msg})")
+
+
+def units_path(path):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.units{ext}"
+
+
+def _read_csv(path):
+    """Read a subjects CSV joined with its <name>.units.csv sub-table.
+
+    The units file has a subject_title column plus UNIT_FIELDS, with each
+    subject's units on consecutive rows in the same order as the subjects file,
+    so both files are streamed side by side without holding either in memory.
+    List cells (graduate_attributes, blooms_levels) are ';'-separated.
+    """
+    with open(path, encoding="utf-8", newline="") as subjects_file, open(units_path(path), encoding="utf-8", newline="") as units_file:
+        unit_rows = csv.DictReader(units_file)
+        groups = itertools.groupby(unit_rows, key=lambda row: row.get("subject_title"))
+        pending = next(groups, None)
+
+        subject_rows = csv.DictReader(subjects_file)
+        for row in subject_rows:
+            line_no = subject_rows.line_num
+            units = []
+            if pending is not None and pending[0] == row.get("subject_title"):
+                units = [
+                    {
+                        "title": unit["title"],
+                        "focus": unit["focus"],
+                        "outcome_focus": unit["outcome_focus"],
+                        "blooms_levels": _split_list(unit["blooms_levels"]),
+                    }
+                    for unit in pending[1]
+                ]
+                pending = next(groups, None)
+            record = {key: value for key, value in row.items() if key is not None}
+            if "graduate_attributes" in record:
+                record["graduate_attributes"] = _split_list(record["graduate_attributes"])
+            record["units"] = units
+            yield line_no, record
+
+
+def _read_yaml(path):
+    try:
+        import yaml
+    except ImportError:
+        raise RuntimeError(f"PyYAML is required to read {path} (pip install pyyaml)")
+
+    with open(path, encoding="utf-8") as f:
+        loader = yaml.SafeLoader(f)
+        try:
+            while loader.check_node():
+                node = loader.get_node()
+                # A document is either one subject or a list of subjects
+                items = node.value if isinstance(node, yaml.SequenceNode) else [node]
+                for item in items:
+                    yield item.start_mark.line + 1, loader.construct_object(item, deep=True)
+        except yaml.YAMLError as e:
+            mark = getattr(e, "problem_mark", None)
+            line_no = mark.line + 1 if mark else 0
+            yield line_no, RecordError(path, line_no, f"invalid YAML ({e})")
+        finally:
+            loader.dispose()
+
+
+READERS = {".jsonl": _read_jsonl, ".csv": _read_csv, ".yaml": _read_yaml, ".yml": _read_yaml}
+
+
+def catalog_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    if os.path.splitext(name)[1] in READERS and not name.endswith(".units.csv"):
+                        yield full
+        else:
+            yield path
+
+
+def report_error(error):
+    print(f"⚠️ Skipping bad record at {error}")
+
+
+def iter_subjects(paths, on_error=report_error):
+    """Lazily yield valid subject records from JSONL, CSV or YAML files and directories.
+
+    Invalid records are passed to on_error as RecordError (with file and line)
+    and skipped, so one bad row never stops the run.
+    """
+    for path in catalog_files(paths):
+        reader = READERS.get(os.path.splitext(path)[1])
+        if reader is None:
+            on_error(RecordError(path, 0, "unsupported catalog format"))
+            continue
+        try:
+            for line_no, record in reader(path):
+                if isinstance(record, RecordError):
+                    on_error(record)
+                    continue
+                message = validate_subject(record)
+                if message:
+                    on_error(RecordError(path, line_no, message))
+                    continue
+                yield record
+        except (OSError, RuntimeError) as e:
+            on_error(RecordError(path, 0, str(e)))
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import time
+
+from renderers import atomic_write
+
+
+def subject_hash(subj, model_name, prompt_version, mode="text"):
+    """Hash everything that determines a subject's generated output."""
+    payload = json.dumps(
+        {"subject": subj, "model": model_name, "prompt_version": prompt_version, "mode": mode},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """Records each subject's input hash and output files between runs.
+
+    Stored as JSON mapping subject title to {"hash", "outputs", "updated"}.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+
+        atomic_write(self.path, write)
+
+    def plan(self, subjects, model_name, prompt_version, mode="text", force=False, outputs=None):
+        """Split subjects into (todo, up_to_date).
+
+        todo holds (subject, digest, reason) tuples where reason is "new",
+        "changed", "missing output" or "forced"; up_to_date holds (subject, digest).
+        outputs(subject), if given, lists the files this run wants, so a newly
+        requested format counts as a missing output.
+        """
+        todo, up_to_date = [], []
+        for subj in subjects:
+            digest = subject_hash(subj, model_name, prompt_version, mode)
+            entry = self.entries.get(subj["subject_title"])
+            if force:
+                reason = "forced"
+            elif entry is None:
+                reason = "new"
+            elif entry["hash"] != digest:
+                reason = "changed"
+            elif not all(os.path.exists(path) for path in entry["outputs"]) or (
+                outputs is not None and not set(outputs(subj)) <= set(entry["outputs"])
+            ):
+                reason = "missing output"
+            else:
+                up_to_date.append((subj, digest))
+                continue
+            todo.append((subj, digest, reason))
+        return todo, up_to_date
+
+    def record(self, subj, digest, outputs):
+        self.entries[subj["subject_title"]] = {"hash": digest, "outputs": list(outputs), "updated": time.time()}
+
+
+def print_plan(todo, up_to_date):
+    for subj, _, reason in todo:
+        print(f"🔄 {subj['subject_title']}: {reason}")
+    for subj, _ in up_to_date:
+        print(f"⏭️ {subj['subject_title']}: up to date")
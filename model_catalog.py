@@ -0,0 +1,47 @@
+import difflib
+import json
+import os
+import time
+
+from renderers import atomic_write
+
+CATALOG_PATH = os.getenv("MODEL_CATALOG_PATH", ".model_catalog.json")
+CATALOG_TTL = float(os.getenv("MODEL_CATALOG_TTL_HOURS", "24")) * 3600
+
+
+def _fetch():
+    import google.generativeai as genai
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable not set!")
+    genai.configure(api_key=api_key)
+    return [{"name": m.name, "methods": list(m.supported_generation_methods)} for m in genai.list_models()]
+
+
+def list_models(path=CATALOG_PATH, ttl=CATALOG_TTL, refresh=False):
+    """Return genai.list_models() as [{"name", "methods"}], cached on disk for ttl seconds."""
+    if not refresh and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if time.time() - cached["fetched"] < ttl:
+            return cached["models"]
+
+    models = _fetch()
+
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched": time.time(), "models": models}, f, indent=2)
+
+    atomic_write(path, write)
+    return models
+
+
+def validate_model_name(model_name, **kwargs):
+    """Raise ValueError unless model_name is a cached model that supports generateContent."""
+    full_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+    usable = [m["name"] for m in list_models(**kwargs) if "generateContent" in m["methods"]]
+    if full_name not in usable:
+        close = difflib.get_close_matches(full_name, usable, n=3)
+        hint = f" Did you mean: {', '.join(close)}?" if close else ""
+        raise ValueError(f"Model {model_name!r} is not available for generateContent.{hint}")
@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import journal
+import telemetry
+from refine3 import outcome_data, output_formats, subject_processor
+from renderers import write_outputs
+
+_DONE = object()
+
+
+def run_pipeline(subjects, model, cache, max_in_flight=4, render_workers=None, queue_size=16):
+    """Overlap generation and rendering.
+
+    Up to max_in_flight generation threads, each running the configured
+    mode's subject_processor(), push parsed outcome records onto a queue of at most queue_size entries, and a dispatcher hands them to a pool
+    of render_workers processes writing the requested output formats.
+    Generation blocks when the renderers fall behind, and new subjects are only
+    pulled from subjects when a generation slot frees up, so memory stays
+    bounded for large catalogs.
+    Returns (filenames, error) pairs in input order.
+    """
+    formats = output_formats()
+    process = subject_processor()
+    render_workers = render_workers or os.cpu_count() or 1
+    results = {}
+    records = queue.Queue(maxsize=queue_size)
+    generation_slots = threading.BoundedSemaphore(max_in_flight)
+    render_slots = threading.BoundedSemaphore(render_workers * 2)
+
+    def generate(idx, subj):
+        def keep(subj, course_outcomes, program_outcomes, unit_outcomes=None):
+            # Rendering is left to the process pool instead of save_outcomes
+            data = outcome_data(subj, course_outcomes, program_outcomes)
+            data["unit_outcomes"] = unit_outcomes
+            return data
+
+        try:
+            with telemetry.recorder().subject(subj["subject_title"]):
+                data = process(subj, model, cache, save=keep)
+            records.put((idx, data))
+        except Exception as e:
+            results[idx] = (None, e)
+        finally:
+            generation_slots.release()
+
+    def rendered(idx, data, future):
+        error = future.exception()
+        if error is None:
+            journal.mark(data, "rendered", outputs=future.result())
+        results[idx] = (future.result(), None) if error is None else (None, error)
+        render_slots.release()
+
+    def dispatch(renderers):
+        while True:
+            record = records.get()
+            if record is _DONE:
+                return
+            idx, data = record
+            render_slots.acquire()
+            try:
+                future = renderers.submit(write_outputs, data, formats)
+            except Exception as e:
+                results[idx] = (None, e)
+                render_slots.release()
+                continue
+            future.add_done_callback(lambda f, idx=idx, data=data: rendered(idx, data, f))
+
+    count = 0
+    with ProcessPoolExecutor(max_workers=render_workers) as renderers:
+        dispatcher = threading.Thread(target=dispatch, args=(renderers,), daemon=True)
+        dispatcher.start()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as generators:
+            for idx, subj in enumerate(subjects):
+                generation_slots.acquire()
+                generators.submit(generate, idx, subj)
+                count += 1
+        records.put(_DONE)
+        dispatcher.join()
+
+    return [results[idx] for idx in range(count)]
@@ -0,0 +1,204 @@
+import random
+import re
+import threading
+import time
+
+import telemetry
+from backends import estimate_tokens
+
+# HTTP statuses worth retrying: quota exhaustion and transient server errors
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+
+# Expected answer size counted against the tokens-per-minute budget
+OUTPUT_TOKENS_PER_CALL = 600
+
+
+def error_code(error):
+    code = getattr(error, "code", None)
+    # google.api_core errors expose the HTTP status as an int; gRPC codes are enums
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    return error_code(error) in RETRYABLE_CODES
+
+
+def retry_after(error):
+    """Return the server's suggested retry delay in seconds, if it gave one."""
+    value = getattr(error, "retry_after", None)
+    if value is not None:
+        return float(value)
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at per_minute / 60 tokens per second.
+
+    burst defaults to a tenth of a minute's budget so a cold start cannot spend
+    much more than the per-minute quota inside any one-minute window. A request
+    larger than the burst still goes through once the bucket is full, leaving
+    the balance negative; later callers wait off that debt, so the long-run
+    rate holds whatever the request size.
+    """
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, per_minute / 10.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        # Only wait for as much as the bucket can hold, but charge the full amount
+        needed = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedModel:
+    """Wraps a backend with request/token budgets and jittered retries.
+
+    Each call waits for a slot in the requests-per-minute and tokens-per-minute
+    buckets. 429 and 5xx errors are retried up to max_retries times with
+    jittered exponential backoff, or after the server's retry-after hint when
+    present. A 429 also pauses every caller sharing this wrapper until the
+    cooldown has passed.
+
+    slots, a semaphore shared by every wrapper drawing on the same budget, caps
+    how many attempts are in flight at once however many threads call in, so
+    nested fan-outs and repairs stay within MAX_IN_FLIGHT.
+    """
+
+    def __init__(self, model, requests_per_minute=0, tokens_per_minute=0, max_retries=5, base_delay=1.0, max_delay=60.0, slots=None):
+        self.model = model
+        self.model_name = model.model_name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.slots = slots
+        self._cooldown_until = 0.0
+        self._last = threading.local()
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _wait_for_slot(self, prompt):
+        with self._lock:
+            cooldown = self._cooldown_until - time.monotonic()
+        if cooldown > 0:
+            time.sleep(cooldown)
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None:
+            self.tokens.acquire(estimate_tokens(str(prompt)) + OUTPUT_TOKENS_PER_CALL)
+
+    def generate_content(self, prompt, **settings):
+        if settings.get("stream"):
+            # Nothing is waited for or held until the caller starts iterating
+            return self._recorded_stream(prompt, settings)
+        response, _start, _attempt = self._call(prompt, settings)
+        return response
+
+    def _call(self, prompt, settings):
+        """Issue the request with retries; returns (response, start, attempt).
+
+        For streams the shared slot is still held on return, and the caller
+        must release it once the stream is consumed.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot(prompt)
+            error = None
+            streaming = False
+            # The shared slot is held only while the request is in flight, not during backoff
+            if self.slots is not None:
+                self.slots.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.model.generate_content(prompt, **settings)
+                streaming = bool(settings.get("stream"))
+            except Exception as e:
+                error = e
+            finally:
+                if self.slots is not None and not streaming:
+                    self.slots.release()
+            if streaming:
+                return response, start, attempt
+
+            elapsed = time.perf_counter() - start
+            if error is None:
+                telemetry.recorder().call(elapsed, response=response, attempt=attempt)
+                self._last.latency = elapsed
+                return response, start, attempt
+
+            telemetry.recorder().call(elapsed, error=error, attempt=attempt)
+            if not is_retryable(error) or attempt == self.max_retries:
+                raise error
+            telemetry.recorder().add("retries")
+            delay = retry_after(error) or self.backoff(attempt)
+            if error_code(error) == 429:
+                with self._lock:
+                    self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            print(f"⏳ {error} — retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+            time.sleep(delay)
+
+    def last_attempt_latency(self):
+        """Duration of the calling thread's last successful attempt, without quota waits or backoff."""
+        return getattr(self._last, "latency", None)
+
+    def _recorded_stream(self, prompt, settings):
+        """Open the stream on the first step, yield its chunks, then free its slot and record the call.
+
+        A generator that is never iterated therefore holds no slot. The call is
+        recorded with the time until the last chunk and the usage metadata
+        Gemini attaches to the final chunk, not when the stream opens.
+        """
+        chunks, start, attempt = self._call(prompt, settings)
+        last = error = None
+        try:
+            for last in chunks:
+                yield last
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+            telemetry.recorder().call(time.perf_counter() - start, response=last, error=error, attempt=attempt)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def run_with_requeue(subjects, run, rounds=2):
+    """Run subjects, then re-run those that failed with a retryable error up to rounds more times.
+
+    run(subjects) must return (result, error) pairs in input order; the merged
+    results keep that order.
+    """
+    subjects = list(subjects)
+    results = run(subjects)
+    for round_no in range(1, rounds + 1):
+        failed = [idx for idx, (_, error) in enumerate(results) if error is not None and is_retryable(error)]
+        if not failed:
+            break
+        print(f"\n🔁 Re-queueing {len(failed)} subject(s) that hit quota or server errors (round {round_no}/{rounds})")
+        for idx, outcome in zip(failed, run([subjects[idx] for idx in failed])):
+            results[idx] = outcome
+    return results
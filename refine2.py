@@ -1,16 +1,12 @@
-import os
-import google.generativeai as genai
+from backends import get_backend
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.pagesizes import letter
+from cache import ResponseCache
 
-# Configure Gemini API
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set!")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Configure model backend (MODEL_BACKEND=gemini|fake)
+model = get_backend()
+cache = ResponseCache.from_env()
 
 def build_prompt(subject_title, program, semester, prerequisites, credits, aim, units, program_goals, graduate_attributes):
     unit_prompts = ""
@@ -169,8 +165,7 @@ for subj in subjects:
 
     full_prompt = build_prompt(**subj)
     try:
-        response = model.generate_content(full_prompt)
-        text_output = response.text
+        text_output = cache.generate(model, full_prompt)
 
         # Parse COs and POs
         lines = [line.strip() for line in text_output.splitlines()]
@@ -1,18 +1,83 @@
 import os
-import google.generativeai as genai
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
+import sys
+import threading
+from functools import lru_cache
 
-# Configure Gemini API
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set!")
+import journal
+import store
+import telemetry
+from engine import run_concurrently
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+# reportlab is imported inside the PDF functions so prompt-only and dry-run
+# commands start without paying for it
 
-def build_prompt(subject_title, program, semester, prerequisites, credits, aim, units, program_goals, graduate_attributes):
+# Bump whenever build_prompt or the output format changes so the manifest regenerates
+PROMPT_VERSION = "vtu-1"
+
+# Records input hashes and outputs so unchanged subjects are skipped
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "syllabus_manifest.json")
+
+# Append-only log of each subject's state, read by `generate --resume`; empty disables it
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "syllabus_journal.jsonl")
+
+# Catalog subjects are planned and generated this many at a time
+CHUNK_SIZE = int(os.getenv("CATALOG_CHUNK_SIZE", "200"))
+
+# Maximum number of generate_content calls in flight at once
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "4"))
+
+# Token budget for batched prompts; 0 sends one request per subject
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "0"))
+
+# Stream responses and parse outcomes as they arrive
+STREAM = os.getenv("STREAM", "0") == "1"
+
+# Ask for schema-validated JSON with per-unit CO grouping instead of text sections
+STRUCTURED = os.getenv("STRUCTURED", "0") == "1"
+
+# Generate each unit's COs as its own cached, concurrent call and merge them
+FAN_OUT_UNITS = os.getenv("FAN_OUT_UNITS", "0") == "1"
+
+# Register the static instruction block once and send only per-subject payloads
+SHARED_PREFIX = os.getenv("SHARED_PREFIX", "0") == "1"
+
+# Render PDFs in this many worker processes while generation continues; 0 renders inline
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0"))
+
+# Gemini quota budgets (0 = unlimited) and retry policy for 429/5xx errors
+REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_RPM", "0"))
+TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TPM", "0"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
+REQUEUE_ROUNDS = int(os.getenv("REQUEUE_ROUNDS", "2"))
+
+# SQLite store of every generated subject's inputs, raw response and outcomes; empty disables it
+OUTCOME_STORE = os.getenv("OUTCOME_STORE", "syllabus_outcomes.sqlite")
+
+# Comma-separated models, cheapest/fastest first; subjects escalate to the next
+# one when an answer is too incomplete to repair (empty = GEMINI_MODEL only)
+MODEL_TIERS = [name.strip() for name in os.getenv("MODEL_TIERS", "").split(",") if name.strip()]
+# Relative price of each tier (default 1, 4, 16, ...)
+MODEL_TIER_COSTS = [float(cost) for cost in os.getenv("MODEL_TIER_COSTS", "").split(",") if cost.strip()]
+
+# Send a duplicate request for calls slower than this percentile of recent
+# latencies (0 = off), for at most HEDGE_BUDGET extra requests per call
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+
+# Append the locally computed CO-PO articulation matrix to every PDF
+ARTICULATION = os.getenv("ARTICULATION", "1") == "1"
+
+# Comma-separated output formats per subject: pdf, html, md, json, docx (needs python-docx)
+OUTPUT_FORMATS = os.getenv("OUTPUT_FORMATS", "pdf")
+
+# `cli.py serve` writes each task's outputs to <SERVICE_OUTPUT_DIR>/<task hash>/
+SERVICE_OUTPUT_DIR = os.getenv("SERVICE_OUTPUT_DIR", "service_out")
+
+# Per-call event log (<run>.jsonl) and Prometheus metrics (<run>.prom); empty disables the files
+TELEMETRY_DIR = os.getenv("TELEMETRY_DIR", "telemetry")
+
+
+def format_units(units):
     unit_prompts = ""
     for idx, unit in enumerate(units, start=1):
         unit_prompts += f"""
@@ -21,6 +86,11 @@ Unit {idx}: {unit['title']}
 - Outcome Focus: {unit['outcome_focus']}
 - Bloom’s Taxonomy Levels: {', '.join(unit['blooms_levels'])}
 """
+    return unit_prompts
+
+
+def build_prompt(subject_title, program, semester, prerequisites, credits, aim, units, program_goals, graduate_attributes):
+    unit_prompts = format_units(units)
 
     graduate_attr_str = "\n".join(f"- {attr}" for attr in graduate_attributes)
 
@@ -73,9 +143,9 @@ Do NOT include any other text or explanation.
     return prompt
 
 
-def create_pdf(data, filename):
-    doc = SimpleDocTemplate(filename, pagesize=letter)
-    styles = getSampleStyleSheet()
+def story_header(data, styles):
+    from reportlab.platypus import Paragraph, Spacer
+
     story = []
 
     # Title
@@ -97,20 +167,110 @@ def create_pdf(data, filename):
     story.append(Paragraph("Overall Aim", styles["Heading2"]))
     story.append(Paragraph(data["aim"], styles["Normal"]))
     story.append(Spacer(1, 12))
+    return story
+
+
+def outcome_paragraph(outcome, styles):
+    from reportlab.platypus import Paragraph
+
+    return Paragraph(f"<b>{outcome.split(':')[0]}:</b> {':'.join(outcome.split(':')[1:])}", styles["Normal"])
+
+
+def articulation_rows(course_outcomes, program_outcomes):
+    """Header and CO rows of the CO-PO articulation matrix, or [] when it is turned off."""
+    from articulation import articulation_matrix, outcome_codes
+
+    if not ARTICULATION or not course_outcomes or not program_outcomes:
+        return []
+
+    levels = articulation_matrix(course_outcomes, program_outcomes)
+    rows = [[""] + outcome_codes(program_outcomes, "PO")]
+    for code, row in zip(outcome_codes(course_outcomes, "CO"), levels):
+        rows.append([code] + [str(level) if level else "-" for level in row])
+    return rows
+
+
+def articulation_table(course_outcomes, program_outcomes, styles):
+    from reportlab.lib import colors
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+
+    rows = articulation_rows(course_outcomes, program_outcomes)
+    if not rows:
+        return []
+
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("BACKGROUND", (0, 0), (0, -1), colors.lightgrey),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+        ("ALIGN", (1, 1), (-1, -1), "CENTER"),
+    ]))
+    return [
+        Spacer(1, 12),
+        Paragraph("CO-PO Articulation Matrix", styles["Heading2"]),
+        table,
+        Spacer(1, 6),
+        Paragraph("3 = strong, 2 = moderate, 1 = slight correlation, - = none", styles["Italic"]),
+    ]
+
+
+def build_pdf(story, filename):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(filename, pagesize=letter)
+    doc.build(story)
+
+
+_stylesheet_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def stylesheet():
+    # Built once per process and shared by every document; nothing mutates it
+    from reportlab.lib.colors import getAllNamedColors
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    with _stylesheet_lock:
+        # reportlab fills its named-colour table on first use without a lock, and a
+        # render racing that fill fails with "Invalid color value 'black'"
+        getAllNamedColors()
+        return getSampleStyleSheet()
+
+
+def create_pdf(data, filename):
+    build_pdf(subject_story(data, stylesheet()), filename)
+
+
+def subject_story(data, styles):
+    from reportlab.platypus import Paragraph, Spacer
+
+    story = story_header(data, styles)
 
     # Course Outcomes
     story.append(Paragraph("Course Outcomes (COs)", styles["Heading2"]))
-    for co in data["course_outcomes"]:
-        story.append(Paragraph(f"<b>{co.split(':')[0]}:</b> {':'.join(co.split(':')[1:])}", styles["Normal"]))
+    if data.get("unit_outcomes"):
+        for unit in data["unit_outcomes"]:
+            story.append(Paragraph(f"Unit {unit['unit']}: {unit['title']}", styles["Heading3"]))
+            for co in unit["course_outcomes"]:
+                story.append(outcome_paragraph(co, styles))
+    else:
+        for co in data["course_outcomes"]:
+            story.append(outcome_paragraph(co, styles))
     story.append(Spacer(1, 12))
 
     # Program Outcomes
     story.append(Paragraph("Program Outcomes (POs)", styles["Heading2"]))
     for po in data["program_outcomes"]:
-        story.append(Paragraph(f"<b>{po.split(':')[0]}:</b> {':'.join(po.split(':')[1:])}", styles["Normal"]))
+        story.append(outcome_paragraph(po, styles))
+
+    # CO-PO articulation matrix
+    story.extend(articulation_table(data["course_outcomes"], data["program_outcomes"], styles))
 
     story.append(Spacer(1, 24))
-    doc.build(story)
+    return story
 
 
 
@@ -207,57 +367,139 @@ subjects = [
     }
 ]
 
-# Process each subject
-for subj in subjects:
+def parse_outcomes(text_output):
+    lines = [line.strip() for line in text_output.splitlines()]
+
+    course_outcomes = []
+    program_outcomes = []
+
+    in_cos = False
+    in_pos = False
+
+    for line in lines:
+        if line.startswith("### Course Outcomes"):
+            in_cos = True
+            in_pos = False
+        elif line.startswith("### Program Outcomes"):
+            in_cos = False
+            in_pos = True
+        elif line.startswith("- CO") and in_cos:
+            course_outcomes.append(line[2:].strip())
+        elif line.startswith("- PO") and in_pos:
+            program_outcomes.append(line[2:].strip())
+
+    return course_outcomes, program_outcomes
+
+
+def generate_outcomes(subj, model, cache):
     print(f"\n📘 GENERATING SYLLABUS FOR: {subj['subject_title']}")
 
     full_prompt = build_prompt(**subj)
-    try:
-        response = model.generate_content(full_prompt)
-        text_output = response.text
-
-        # Parse COs and POs
-        lines = [line.strip() for line in text_output.splitlines()]
-
-        course_outcomes = []
-        program_outcomes = []
-
-        in_cos = False
-        in_pos = False
-
-        for line in lines:
-            if line.startswith("### Course Outcomes"):
-                in_cos = True
-                in_pos = False
-            elif line.startswith("### Program Outcomes"):
-                in_cos = False
-                in_pos = True
-            elif line.startswith("- CO") and in_cos:
-                course_outcomes.append(line[2:].strip())
-            elif line.startswith("- PO") and in_pos:
-                program_outcomes.append(line[2:].strip())
-
-        # Fallback in case parsing failed
-        if not course_outcomes or not program_outcomes:
-            print("⚠️ Failed to parse COs/POs from response. Using dummy ones.")
-            course_outcomes = ["CO1: Understand basic concepts", "CO2: Apply principles"]
-            program_outcomes = ["PO1: Apply engineering knowledge", "PO2: Solve complex problems"]
-
-        pdf_data = {
-            "subject_title": subj["subject_title"],
-            "program": subj["program"],
-            "semester": subj["semester"],
-            "prerequisites": subj["prerequisites"],
-            "credits": subj["credits"],
-            "aim": subj["aim"],
-            "course_outcomes": course_outcomes,
-            "program_outcomes": program_outcomes
-        }
-
-        # Save as PDF
-        filename = f"{subj['subject_title'].replace(' ', '_')}_Syllabus.pdf"
-        create_pdf(pdf_data, filename)
-        print(f"✅ Saved PDF: {filename}")
-
-    except Exception as e:
-        print(f"❌ Error generating content for {subj['subject_title']}: {e}")
\ No newline at end of file
+    from repair import Diagnosis, repair_outcomes
+
+    route = getattr(model, "route", None)
+    if route is None:
+        text_output = cache.generate(model, full_prompt)
+    else:
+        # Escalate to a stronger model only when the answer is too incomplete to repair locally
+        model, text_output = route(full_prompt, cache, lambda text: not Diagnosis(subj, *parse_outcomes(text)).needs_model)
+    journal.mark(subj, "generated")
+
+    # Parse COs and POs, then fetch only what is missing or malformed
+    course_outcomes, program_outcomes = parse_outcomes(text_output)
+    course_outcomes, program_outcomes = repair_outcomes(subj, model, cache, course_outcomes, program_outcomes)
+    store.record(subj, model.model_name, text_output, course_outcomes, program_outcomes)
+    journal.mark(subj, "parsed", model=model.model_name)
+
+    return course_outcomes, program_outcomes
+
+
+def outcome_data(subj, course_outcomes, program_outcomes):
+    return {
+        "subject_title": subj["subject_title"],
+        "program": subj["program"],
+        "semester": subj["semester"],
+        "prerequisites": subj["prerequisites"],
+        "credits": subj["credits"],
+        "aim": subj["aim"],
+        "course_outcomes": course_outcomes,
+        "program_outcomes": program_outcomes
+    }
+
+
+def pdf_filename(subj):
+    from renderers import RENDERERS
+    return RENDERERS["pdf"].filename(subj)
+
+
+def output_formats():
+    from renderers import parse_formats
+    return parse_formats(OUTPUT_FORMATS)
+
+
+def save_outcomes(subj, course_outcomes, program_outcomes, unit_outcomes=None):
+    # Write every requested format; returns the filenames
+    from renderers import write_outputs
+
+    data = outcome_data(subj, course_outcomes, program_outcomes)
+    data["unit_outcomes"] = unit_outcomes
+    filenames = write_outputs(data, output_formats())
+    journal.mark(subj, "rendered", outputs=filenames)
+    return filenames
+
+
+def process_subject(subj, model, cache, save=save_outcomes):
+    course_outcomes, program_outcomes = generate_outcomes(subj, model, cache)
+    return save(subj, course_outcomes, program_outcomes)
+
+
+def check_modes():
+    """Raise ValueError for generation settings that cannot be combined."""
+    if BATCH_TOKEN_BUDGET > 0:
+        # Batches are always sent as text prompts and rendered in-thread
+        others = [name for name, enabled in (
+            ("STRUCTURED", STRUCTURED),
+            ("FAN_OUT_UNITS", FAN_OUT_UNITS),
+            ("SHARED_PREFIX", SHARED_PREFIX),
+            ("STREAM", STREAM),
+            ("RENDER_WORKERS", RENDER_WORKERS > 0),
+        ) if enabled]
+        if others:
+            raise ValueError(f"BATCH_TOKEN_BUDGET cannot be combined with {', '.join(others)}")
+
+
+def subject_processor():
+    """The process(subj, model, cache, save=save_outcomes) function for the configured generation mode.
+
+    Once a subject's outcomes are final, process returns
+    save(subj, course_outcomes, program_outcomes, unit_outcomes).
+    """
+    if STRUCTURED:
+        from structured import process_subject_structured as process
+    elif FAN_OUT_UNITS:
+        from fanout import process_subject_fanned_out as process
+    elif SHARED_PREFIX:
+        from context_cache import process_subject_shared_prefix as process
+    elif STREAM:
+        from streaming import process_subject_streaming as process
+    else:
+        process = process_subject
+    return process
+
+
+def run_subjects(subjects, model, cache):
+    # Process subjects concurrently, reporting results in input order
+    if BATCH_TOKEN_BUDGET > 0:
+        from batching import run_batched
+        return run_batched(subjects, model, cache, token_budget=BATCH_TOKEN_BUDGET, max_in_flight=MAX_IN_FLIGHT)
+    if RENDER_WORKERS > 0:
+        from pipeline import run_pipeline
+        return run_pipeline(subjects, model, cache, max_in_flight=MAX_IN_FLIGHT, render_workers=RENDER_WORKERS)
+    process = subject_processor()
+    # One telemetry record per subject
+    return run_concurrently(subjects, telemetry.traced(lambda subj: process(subj, model, cache)), max_in_flight=MAX_IN_FLIGHT)
+
+
+if __name__ == "__main__":
+    from cli import main
+    sys.exit(main(["generate", *sys.argv[1:]]))
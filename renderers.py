@@ -0,0 +1,288 @@
+import contextlib
+import contextvars
+import html
+import importlib.util
+import json
+import os
+import re
+import tempfile
+
+# Directory outputs are written to ("" = current directory); set per task by output_dir()
+_output_dir = contextvars.ContextVar("output_dir", default="")
+
+
+def outcome_parts(outcome):
+    """Split "CO1: text" into ("CO1", "text"), the way the PDF bolds the code."""
+    code, _, text = outcome.partition(":")
+    return code.strip(), text.strip()
+
+
+def unit_groups(data):
+    """(heading, outcomes) pairs for the Course Outcomes section; heading is None without unit grouping."""
+    if data.get("unit_outcomes"):
+        return [(f"Unit {unit['unit']}: {unit['title']}", unit["course_outcomes"]) for unit in data["unit_outcomes"]]
+    return [(None, data["course_outcomes"])]
+
+
+def matrix_rows(data):
+    from refine3 import articulation_rows
+
+    return articulation_rows(data["course_outcomes"], data["program_outcomes"])
+
+
+def metadata_lines(data):
+    return [
+        f"Program: {data['program']}",
+        f"Semester: {data['semester']}",
+        f"Prerequisites: {data['prerequisites']}",
+        f"Credits: {data['credits']}",
+    ]
+
+
+class Renderer:
+    """Writes one subject's outcome_data record to a file of one format.
+
+    Subclasses set extension and implement render(data, filename).
+    """
+
+    extension = None
+
+    def filename(self, subj):
+        # Titles come from catalogs and HTTP clients; keep each to one plain file name
+        name = re.sub(r"[^\w.-]+", "_", subj["subject_title"])
+        directory = _output_dir.get()
+        path = os.path.join(directory, f"{name}_Syllabus.{self.extension}")
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory):
+            raise ValueError(f"Output path {path!r} escapes {directory or os.curdir!r}")
+        return path
+
+    def render(self, data, filename):
+        raise NotImplementedError
+
+
+class PdfRenderer(Renderer):
+    """reportlab layout via refine3.create_pdf; the slowest format by far."""
+
+    extension = "pdf"
+
+    def render(self, data, filename):
+        from refine3 import create_pdf
+
+        create_pdf(data, filename)
+
+
+class TextRenderer(Renderer):
+    """Base for formats written line by line straight to the file."""
+
+    def render(self, data, filename):
+        with open(filename, "w", encoding="utf-8") as f:
+            self.write(data, f)
+
+    def write(self, data, f):
+        raise NotImplementedError
+
+
+class HtmlRenderer(TextRenderer):
+    extension = "html"
+
+    def write(self, data, f):
+        e = html.escape
+        f.write(f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n<title>{e(data["subject_title"])}</title>\n</head>\n<body>\n')
+        f.write(f"<h1>{e(data['subject_title'])}</h1>\n")
+        for line in metadata_lines(data):
+            f.write(f"<p>{e(line)}</p>\n")
+        f.write(f"<h2>Overall Aim</h2>\n<p>{e(data['aim'])}</p>\n")
+
+        f.write("<h2>Course Outcomes (COs)</h2>\n")
+        for heading, outcomes in unit_groups(data):
+            if heading:
+                f.write(f"<h3>{e(heading)}</h3>\n")
+            self._outcomes(outcomes, f)
+        f.write("<h2>Program Outcomes (POs)</h2>\n")
+        self._outcomes(data["program_outcomes"], f)
+
+        rows = matrix_rows(data)
+        if rows:
+            f.write("<h2>CO-PO Articulation Matrix</h2>\n<table>\n")
+            f.write("<tr>" + "".join(f"<th>{e(cell)}</th>" for cell in rows[0]) + "</tr>\n")
+            for row in rows[1:]:
+                f.write(f"<tr><th>{e(row[0])}</th>" + "".join(f"<td>{cell}</td>" for cell in row[1:]) + "</tr>\n")
+            f.write("</table>\n<p><i>3 = strong, 2 = moderate, 1 = slight correlation, - = none</i></p>\n")
+        f.write("</body>\n</html>\n")
+
+    def _outcomes(self, outcomes, f):
+        for outcome in outcomes:
+            code, text = outcome_parts(outcome)
+            f.write(f"<p><b>{html.escape(code)}:</b> {html.escape(text)}</p>\n")
+
+
+class MarkdownRenderer(TextRenderer):
+    extension = "md"
+
+    def write(self, data, f):
+        f.write(f"# {data['subject_title']}\n\n")
+        for line in metadata_lines(data):
+            f.write(f"- {line}\n")
+        f.write(f"\n## Overall Aim\n\n{data['aim']}\n")
+
+        f.write("\n## Course Outcomes (COs)\n")
+        for heading, outcomes in unit_groups(data):
+            if heading:
+                f.write(f"\n### {heading}\n")
+            self._outcomes(outcomes, f)
+        f.write("\n## Program Outcomes (POs)\n")
+        self._outcomes(data["program_outcomes"], f)
+
+        rows = matrix_rows(data)
+        if rows:
+            f.write("\n## CO-PO Articulation Matrix\n\n")
+            f.write("| " + " | ".join(rows[0]) + " |\n")
+            f.write("|" + "---|" * len(rows[0]) + "\n")
+            for row in rows[1:]:
+                f.write(f"| **{row[0]}** | " + " | ".join(row[1:]) + " |\n")
+            f.write("\n_3 = strong, 2 = moderate, 1 = slight correlation, - = none_\n")
+
+    def _outcomes(self, outcomes, f):
+        f.write("\n")
+        for outcome in outcomes:
+            code, text = outcome_parts(outcome)
+            f.write(f"- **{code}:** {text}\n")
+
+
+class JsonRenderer(TextRenderer):
+    """The outcome_data record itself, plus the articulation matrix, for LMS imports."""
+
+    extension = "json"
+
+    def write(self, data, f):
+        rows = matrix_rows(data)
+        record = dict(data)
+        if rows:
+            record["articulation"] = {
+                "program_outcomes": rows[0][1:],
+                "course_outcomes": {row[0]: [0 if cell == "-" else int(cell) for cell in row[1:]] for row in rows[1:]},
+            }
+        json.dump(record, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+class DocxRenderer(Renderer):
+    """Word document via python-docx, which is only needed when docx is requested."""
+
+    extension = "docx"
+
+    def render(self, data, filename):
+        try:
+            from docx import Document
+        except ImportError:
+            raise ImportError("DOCX output needs python-docx (pip install python-docx)") from None
+
+        doc = Document()
+        doc.add_heading(data["subject_title"], level=0)
+        for line in metadata_lines(data):
+            doc.add_paragraph(line)
+        doc.add_heading("Overall Aim", level=1)
+        doc.add_paragraph(data["aim"])
+
+        doc.add_heading("Course Outcomes (COs)", level=1)
+        for heading, outcomes in unit_groups(data):
+            if heading:
+                doc.add_heading(heading, level=2)
+            self._outcomes(doc, outcomes)
+        doc.add_heading("Program Outcomes (POs)", level=1)
+        self._outcomes(doc, data["program_outcomes"])
+
+        rows = matrix_rows(data)
+        if rows:
+            doc.add_heading("CO-PO Articulation Matrix", level=1)
+            table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+            table.style = "Table Grid"
+            for cells, row in zip(table.rows, rows):
+                for cell, value in zip(cells.cells, row):
+                    cell.text = value
+            doc.add_paragraph("3 = strong, 2 = moderate, 1 = slight correlation, - = none").runs[0].italic = True
+        doc.save(filename)
+
+    def _outcomes(self, doc, outcomes):
+        for outcome in outcomes:
+            code, text = outcome_parts(outcome)
+            paragraph = doc.add_paragraph()
+            paragraph.add_run(f"{code}:").bold = True
+            paragraph.add_run(f" {text}")
+
+
+RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (PdfRenderer(), HtmlRenderer(), MarkdownRenderer(), JsonRenderer(), DocxRenderer())
+}
+
+
+def parse_formats(value):
+    """["pdf", "md", ...] from a comma-separated string; raises ValueError for unknown formats."""
+    formats = list(dict.fromkeys(fmt.strip().lower() for fmt in value.split(",") if fmt.strip()))
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown output format(s) {value!r}; choose from {', '.join(RENDERERS)}")
+    if "docx" in formats and importlib.util.find_spec("docx") is None:
+        raise ValueError("DOCX output needs python-docx (pip install python-docx)")
+    return formats
+
+
+@contextlib.contextmanager
+def output_dir(path):
+    """Write outputs rendered in this context (and threads copying it) under path."""
+    os.makedirs(path, exist_ok=True)
+    token = _output_dir.set(path)
+    try:
+        yield path
+    finally:
+        _output_dir.reset(token)
+
+
+def output_filenames(subj, formats):
+    return [RENDERERS[fmt].filename(subj) for fmt in formats]
+
+
+# The umask can only be read by setting it, which races with threads creating
+# files, so it is read once here while the process is still single-threaded
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(filename):
+    """Mode a replacement for filename should get: the existing file's, or what open() would create."""
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write(filename, write):
+    """Call write(path) on a temporary file next to filename, then rename it into place.
+
+    A crash or Ctrl-C mid-render leaves at most a hidden temp file, never a
+    truncated output under the real name. mkstemp creates the temp file 0600,
+    so it is given the permissions a plain open() would have before the rename.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}-", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        write(tmp)
+        os.chmod(tmp, _file_mode(filename))
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_outputs(data, formats):
+    """Render data in each requested format and return the written filenames in format order."""
+    filenames = []
+    for fmt in formats:
+        renderer = RENDERERS[fmt]
+        filename = renderer.filename(data)
+        atomic_write(filename, lambda path: renderer.render(data, path))
+        filenames.append(filename)
+    return filenames
@@ -0,0 +1,254 @@
+import re
+
+import telemetry
+from articulation import keywords
+from engine import run_concurrently
+from fanout import build_program_prompt, build_unit_prompt, renumber
+from refine3 import parse_outcomes
+
+# VTU shape every subject must have before it is rendered
+COS_PER_UNIT = (2, 3)
+PO_COUNT = 6
+
+OUTCOME_LINE = re.compile(r"^(CO|PO)\s*(\d+)\s*[:.\-]\s*(\S.*)$")
+
+PO_TOPUP_PROMPT = """
+You are an education expert helping generate program outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+Subject Title: {subject_title}
+Program: {program}
+
+Program Goals: {program_goals}
+
+Graduate Attributes:
+{graduate_attributes}
+
+The subject already has these Program Outcomes:
+{existing}
+
+### Instructions:
+Generate exactly {count} more **Program Outcomes (POs)** that do not repeat the ones above, numbered like:
+- PO{start}: ...
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with Bloom's Taxonomy
+- Written in concise, academic language
+
+Output only this section:
+---
+### Program Outcomes
+- PO{start}: ...
+---
+Do NOT include any other text or explanation.
+"""
+
+
+class OutcomeError(ValueError):
+    """Raised when a subject's outcomes are still incomplete after repair."""
+
+
+def clean(outcomes, prefix, issues):
+    """Drop malformed lines and renumber, noting each problem in issues.
+
+    Returns (outcomes, kept) where kept holds the input index of each outcome.
+    """
+    valid, kept, seen = [], [], set()
+    for idx, outcome in enumerate(outcomes):
+        match = OUTCOME_LINE.match(outcome.strip())
+        if not match or match.group(1) != prefix:
+            issues.append(f"malformed {prefix} {outcome.strip()[:40]!r}")
+            continue
+        if match.group(2) in seen and f"duplicate {prefix}{match.group(2)}" not in issues:
+            issues.append(f"duplicate {prefix}{match.group(2)}")
+        seen.add(match.group(2))
+        valid.append(outcome.strip())
+        kept.append(idx)
+    return renumber(valid, prefix), kept
+
+
+def assign_units(subj, course_outcomes):
+    """Best-matching unit number for each CO, or None if it matches none.
+
+    A CO that names a unit's title belongs to that unit. Otherwise the unit
+    sharing the most keywords wins, with title words counting double, and
+    ties go to the unit nearest the CO's position since answers list units in order.
+    """
+    titles = [unit["title"].lower() for unit in subj["units"]]
+    title_words = [set(keywords(unit["title"])) for unit in subj["units"]]
+    units = [set(keywords(f"{unit['focus']} {unit['outcome_focus']}")) for unit in subj["units"]]
+    assigned = []
+    for n, co in enumerate(course_outcomes):
+        named = [idx for idx, title in enumerate(titles) if title in co.lower()]
+        if named:
+            # The longest title, so "Layer" does not claim a CO about "Network Layer"
+            assigned.append(max(named, key=lambda idx: len(titles[idx])) + 1)
+            continue
+        words = set(keywords(co))
+        scores = [2 * len(words & title) + len(words & unit) for title, unit in zip(title_words, units)]
+        expected = n * len(units) / max(1, len(course_outcomes))
+        best = max(range(len(units)), key=lambda idx: (scores[idx], -abs(idx - expected)), default=None)
+        assigned.append(best + 1 if best is not None and scores[best] else None)
+    return assigned
+
+
+class Diagnosis:
+    """What is wrong with a parsed subject and what a repair has to fetch.
+
+    course_outcomes / program_outcomes are already cleaned locally (malformed
+    lines dropped, duplicates renumbered, extras trimmed). unit_needs maps a
+    unit number to how many COs it is short, and always includes every unit
+    without a CO, even when the total is in range; pos_missing counts absent POs.
+
+    units gives each CO's unit number when the answer was already grouped by
+    unit (fan-out, structured); otherwise COs are assigned by assign_units.
+    """
+
+    def __init__(self, subj, course_outcomes, program_outcomes, units=None):
+        self.issues = []
+        cos, kept = clean(course_outcomes, "CO", self.issues)
+        pos, _ = clean(program_outcomes, "PO", self.issues)
+        low, high = (n * len(subj["units"]) for n in COS_PER_UNIT)
+
+        if units is not None:
+            units = [units[idx] for idx in kept]
+            # A known grouping is held to the per-unit maximum too
+            for idx in sorted(set(units)):
+                count = units.count(idx)
+                if count > COS_PER_UNIT[1]:
+                    self.issues.append(f"{count} COs for unit {idx}, expected at most {COS_PER_UNIT[1]}")
+                    extra = [at for at, unit in enumerate(units) if unit == idx][COS_PER_UNIT[1]:]
+                    cos = [co for at, co in enumerate(cos) if at not in extra]
+                    units = [unit for at, unit in enumerate(units) if at not in extra]
+            cos = renumber(cos, "CO")
+        if len(cos) > high:
+            self.issues.append(f"{len(cos)} COs, expected at most {high}")
+            cos = cos[:high]
+        self.units = units[:len(cos)] if units is not None else assign_units(subj, cos)
+        counts = {idx: self.units.count(idx) for idx in range(1, len(subj["units"]) + 1)}
+        short = low - len(cos)
+        if short > 0:
+            self.issues.append(f"{len(cos)} COs, expected at least {low}")
+        # Every unit no CO covers is fetched (every thin unit when the grouping is
+        # known), then the thinnest ones until the shortfall is covered
+        self.unit_needs = {}
+        for idx in sorted(counts, key=lambda idx: counts[idx]):
+            if counts[idx] >= COS_PER_UNIT[0] or (counts[idx] and short <= 0 and units is None):
+                break
+            self.unit_needs[idx] = COS_PER_UNIT[1] if counts[idx] == 0 and short > 0 else COS_PER_UNIT[0] - counts[idx]
+            # A unit prompt is only guaranteed to return the minimum
+            short -= COS_PER_UNIT[0] - counts[idx]
+        missing = [idx for idx in self.unit_needs if counts[idx] == 0]
+        if missing:
+            self.issues.append(f"no COs for unit(s) {', '.join(map(str, sorted(missing)))}")
+        if units is not None:
+            for idx in sorted(set(self.unit_needs) - set(missing)):
+                self.issues.append(f"{counts[idx]} CO(s) for unit {idx}, expected at least {COS_PER_UNIT[0]}")
+
+        if len(pos) > PO_COUNT:
+            self.issues.append(f"{len(pos)} POs, expected {PO_COUNT}")
+            pos = pos[:PO_COUNT]
+        self.pos_missing = PO_COUNT - len(pos)
+        if self.pos_missing:
+            self.issues.append(f"{len(pos)} POs, expected {PO_COUNT}")
+
+        self.course_outcomes = cos
+        self.program_outcomes = pos
+
+    @property
+    def needs_model(self):
+        return bool(self.unit_needs or self.pos_missing)
+
+
+def trim(cos, units, limit):
+    """Drop COs in place until at most limit remain: first ones no unit claims, then the fullest unit's last."""
+    while len(cos) > limit:
+        fullest = None if None in units else max(set(units), key=units.count)
+        at = len(units) - 1 - units[::-1].index(fullest)
+        del cos[at], units[at]
+
+
+def build_po_topup_prompt(subj, existing, count):
+    return PO_TOPUP_PROMPT.format(
+        subject_title=subj["subject_title"],
+        program=subj["program"],
+        program_goals=subj["program_goals"],
+        graduate_attributes="\n".join(f"- {attr}" for attr in subj["graduate_attributes"]),
+        existing="\n".join(f"- {po}" for po in existing),
+        count=count,
+        start=len(existing) + 1,
+    )
+
+
+def repair_outcomes(subj, model, cache, course_outcomes, program_outcomes):
+    """Return (course_outcomes, program_outcomes) fixed up to the VTU shape.
+
+    Local problems are fixed without a call. Units that are short of COs get
+    only their unit prompt, and missing POs only a PO prompt, all sent
+    concurrently; the answers are spliced into the existing lists. Raises
+    OutcomeError if the subject is still incomplete afterwards.
+    """
+    cos, pos, _ = _repair(subj, model, cache, course_outcomes, program_outcomes)
+    return cos, pos
+
+
+def repair_unit_outcomes(subj, model, cache, unit_outcomes, program_outcomes):
+    """repair_outcomes for an answer already grouped by unit.
+
+    Returns (unit_outcomes, course_outcomes, program_outcomes) with one
+    unit_outcomes entry per subject unit, regrouped after any repair.
+    """
+    # Splicing assumes COs in unit order
+    unit_outcomes = sorted(unit_outcomes, key=lambda unit: unit["unit"])
+    cos = [co for unit in unit_outcomes for co in unit["course_outcomes"]]
+    units = [unit["unit"] for unit in unit_outcomes for _ in unit["course_outcomes"]]
+    cos, pos, units = _repair(subj, model, cache, cos, program_outcomes, units)
+    grouped = [
+        {"unit": idx, "title": unit["title"], "course_outcomes": [co for co, n in zip(cos, units) if n == idx]}
+        for idx, unit in enumerate(subj["units"], start=1)
+    ]
+    return grouped, cos, pos
+
+
+def _repair(subj, model, cache, course_outcomes, program_outcomes, units=None):
+    diagnosis = Diagnosis(subj, course_outcomes, program_outcomes, units)
+    # Units known up front must each reach the minimum; assigned ones only need a CO
+    floor = 1 if units is None else COS_PER_UNIT[0]
+    if not diagnosis.issues:
+        telemetry.recorder().add("parse_ok")
+        return diagnosis.course_outcomes, diagnosis.program_outcomes, diagnosis.units
+
+    print(f"🩹 Repairing {subj['subject_title']}: {'; '.join(diagnosis.issues)}")
+    cos, pos = diagnosis.course_outcomes, diagnosis.program_outcomes
+    units = list(diagnosis.units)
+
+    requests = [("unit", idx, build_unit_prompt(subj, idx)) for idx in sorted(diagnosis.unit_needs)]
+    if diagnosis.pos_missing:
+        prompt = build_po_topup_prompt(subj, pos, diagnosis.pos_missing) if pos else build_program_prompt(subj)
+        requests.append(("po", None, prompt))
+    answers = run_concurrently(requests, lambda request: cache.generate(model, request[2]), max_in_flight=len(requests) or 1)
+
+    for (kind, idx, _), (text, error) in zip(requests, answers):
+        if error is not None:
+            raise error
+        new_cos, new_pos = parse_outcomes(text or "")
+        if kind == "po":
+            pos = renumber(pos + new_pos[:diagnosis.pos_missing], "PO")
+            continue
+        new_cos = new_cos[:diagnosis.unit_needs[idx]]
+        # Splice after the last CO of this unit or an earlier one
+        at = max((i + 1 for i, unit in enumerate(units) if unit is not None and unit <= idx), default=0)
+        cos[at:at] = new_cos
+        units[at:at] = [idx] * len(new_cos)
+    low, high = (n * len(subj["units"]) for n in COS_PER_UNIT)
+    # Filling an empty unit can push an in-range total past the maximum
+    trim(cos, units, high)
+    cos = renumber(cos, "CO")
+
+    empty = [idx for idx in range(1, len(subj["units"]) + 1) if units.count(idx) < floor]
+    if len(cos) < low or len(pos) != PO_COUNT or empty:
+        telemetry.recorder().add("parse_failed")
+        detail = f"; too few COs for unit(s) {', '.join(map(str, empty))}" if empty else ""
+        raise OutcomeError(f"{subj['subject_title']}: still {len(cos)} COs and {len(pos)} POs after repair{detail}")
+    telemetry.recorder().add("parse_repaired")
+    return cos, pos, units
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import Counter
+
+import telemetry
+
+
+class ModelEstimate:
+    """Exponentially weighted latency and success rate of one model."""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.latency = None
+        self.success = 1.0  # optimistic until the model has been tried
+        self.samples = 0
+
+    def update(self, latency, ok):
+        self.samples += 1
+        self.latency = latency if self.latency is None else (1 - self.alpha) * self.latency + self.alpha * latency
+        self.success = (1 - self.alpha) * self.success + self.alpha * (1.0 if ok else 0.0)
+
+
+class CallTimer:
+    """Passes calls through to tier and times the ones that reach it.
+
+    latency stays None when the response cache answered without calling.
+    """
+
+    def __init__(self, tier):
+        self.tier = tier
+        self.model_name = tier.model_name
+        self.latency = None
+
+    def generate_content(self, prompt, **settings):
+        began = time.perf_counter()
+        try:
+            return self.tier.generate_content(prompt, **settings)
+        finally:
+            self.latency = time.perf_counter() - began
+
+    def __getattr__(self, name):
+        return getattr(self.tier, name)
+
+
+class ModelRouter:
+    """Sends each subject to the cheapest model first and escalates on bad answers.
+
+    tiers are model wrappers ordered cheapest/fastest first, and costs their
+    relative prices (default 1, 4, 16, ...). route() tries them in order until
+    acceptable(text) holds. The starting tier minimises the expected spend to
+    an acceptable answer, where one attempt on tier i costs cost_i times its
+    estimated latency and fails with probability 1 - success_i, so a cheap
+    model that keeps failing validation is skipped. Every probe_every-th
+    subject starts at the cheapest tier anyway so its estimate can recover.
+    Only answers that came from the model update the estimates; cache hits
+    say nothing about a tier's latency.
+
+    Other callers get plain generate_content on the cheapest tier.
+    """
+
+    def __init__(self, tiers, costs=None, probe_every=20, alpha=0.2):
+        self.tiers = list(tiers)
+        self.costs = list(costs) if costs else [4.0 ** idx for idx in range(len(self.tiers))]
+        self.model_name = self.tiers[0].model_name
+        self.probe_every = probe_every
+        self.estimates = {tier.model_name: ModelEstimate(alpha) for tier in self.tiers}
+        self.served = Counter()
+        self.escalations = 0
+        self._routed = 0
+        self._lock = threading.Lock()
+
+    def start_index(self):
+        with self._lock:
+            self._routed += 1
+            if self.probe_every and self._routed % self.probe_every == 0:
+                return 0
+            expected, best, best_cost = 0.0, len(self.tiers) - 1, None
+            for idx in range(len(self.tiers) - 1, -1, -1):
+                estimate = self.estimates[self.tiers[idx].model_name]
+                # Untried models count as instant so they get a first chance
+                expected = self.costs[idx] * (estimate.latency or 0.0) + (1 - estimate.success) * expected
+                if best_cost is None or expected <= best_cost:
+                    best, best_cost = idx, expected
+            return best
+
+    def route(self, prompt, cache, acceptable):
+        """Return (tier, text) from the first tier whose answer passes acceptable(text)."""
+        start = self.start_index()
+        for idx in range(start, len(self.tiers)):
+            tier = self.tiers[idx]
+            last = idx == len(self.tiers) - 1
+            timer = CallTimer(tier)
+            try:
+                text = cache.generate(timer, prompt)
+                ok = acceptable(text)
+            except Exception:
+                self._update(tier, timer.latency, False)
+                if last:
+                    raise
+                ok = False
+            else:
+                self._update(tier, timer.latency, ok)
+            if ok or last:
+                with self._lock:
+                    self.served[tier.model_name] += 1
+                telemetry.recorder().note("model", tier.model_name)
+                return tier, text
+            print(f"🔼 {tier.model_name} answer failed validation; escalating to {self.tiers[idx + 1].model_name}")
+            with self._lock:
+                self.escalations += 1
+
+    def _update(self, tier, latency, ok):
+        if latency is None:
+            return
+        with self._lock:
+            self.estimates[tier.model_name].update(latency, ok)
+
+    def generate_content(self, prompt, **settings):
+        return self.tiers[0].generate_content(prompt, **settings)
+
+    def count_tokens(self, text):
+        return self.tiers[0].count_tokens(text)
+
+    def summary(self):
+        lines = [f"🧭 Routing: {self.escalations} escalation(s)"]
+        for tier in self.tiers:
+            estimate = self.estimates[tier.model_name]
+            latency = f"{estimate.latency:.2f}s" if estimate.latency is not None else "-"
+            lines.append(
+                f"   {tier.model_name}: served {self.served[tier.model_name]}, "
+                f"latency ~{latency}, success ~{estimate.success:.0%} over {estimate.samples} call(s)"
+            )
+        return "\n".join(lines)
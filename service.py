@@ -0,0 +1,341 @@
+"""Local HTTP generation service shared by every department.
+
+    POST /jobs                      one subject, or {"subjects": [...]}; "department" in the
+                                    body or the X-Department header. Returns 202 with job IDs.
+    GET  /jobs?department=D         list jobs
+    GET  /jobs/<id>                 job status, error and artifact URLs
+    GET  /jobs/<id>/events          server-sent events on every status change until done
+    GET  /jobs/<id>/artifacts/<f>   download one of the job's output files
+    GET  /status                    queue depth per department and run counters
+
+All jobs go through one model, one response cache and one pool of
+MAX_IN_FLIGHT workers, so quota limits, retries and hedging apply across
+departments. Jobs for a subject whose prompt is already queued or running
+attach to that work instead of generating it again, and identical prompts
+issued concurrently share one call through the response cache.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import journal
+import telemetry
+from loader import validate_subject
+from refine3 import PROMPT_VERSION, SERVICE_OUTPUT_DIR, build_prompt, subject_processor
+from renderers import output_dir
+
+DEFAULT_DEPARTMENT = "default"
+TERMINAL = ("done", "failed")
+
+# Finished jobs are forgotten after JOB_TTL seconds, and the oldest finished
+# ones sooner once more than MAX_JOBS are held
+JOB_TTL = 24 * 3600
+MAX_JOBS = 10000
+
+
+class FairShareQueue:
+    """Blocking queue with one FIFO per department, served round-robin.
+
+    A department with thousands of queued subjects gets one turn per round,
+    the same as a department with one, so bulk submissions cannot starve
+    anyone else.
+    """
+
+    def __init__(self):
+        self._queues = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, department, item):
+        with self._cond:
+            self._queues.setdefault(department, deque()).append(item)
+            self._cond.notify()
+
+    def get(self):
+        """Next item in round-robin order, or None once the queue is closed."""
+        with self._cond:
+            while not self._queues and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                # Items still queued at shutdown are dropped; their jobs stay "queued"
+                return None
+            department, items = next(iter(self._queues.items()))
+            item = items.popleft()
+            # Served departments go to the back of the rotation
+            del self._queues[department]
+            if items:
+                self._queues[department] = items
+            return item
+
+    def depths(self):
+        with self._cond:
+            return {department: len(items) for department, items in self._queues.items()}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Task:
+    """One unit of generation work, shared by every job that asked for the same prompt."""
+
+    def __init__(self, key, subj, department):
+        self.key = key
+        self.subj = subj
+        self.department = department
+        self.status = "queued"
+        self.error = None
+        self.artifacts = []
+        self.started = None
+        self.finished = None
+
+
+class Job:
+    """One submission; several jobs can share a Task."""
+
+    def __init__(self, task, department, coalesced=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.task = task
+        self.department = department
+        self.coalesced = coalesced
+        self.submitted = time.time()
+
+    def to_dict(self):
+        task = self.task
+        return {
+            "id": self.id,
+            "department": self.department,
+            "subject_title": task.subj["subject_title"],
+            "status": task.status,
+            "error": task.error,
+            "coalesced": self.coalesced,
+            "submitted": self.submitted,
+            "started": task.started,
+            "finished": task.finished,
+            "artifacts": [f"/jobs/{self.id}/artifacts/{os.path.basename(path)}" for path in task.artifacts],
+        }
+
+
+class GenerationService:
+    """Job bookkeeping, the fair-share queue and the worker pool behind the HTTP handler."""
+
+    def __init__(self, model, cache, workers=4, job_ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.model = model
+        self.cache = cache
+        process = subject_processor()
+        self.process = telemetry.traced(lambda subj: process(subj, model, cache))
+        self.queue = FairShareQueue()
+        self.jobs = {}
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.counters = Counter()
+        self._tasks = {}  # prompt hash -> queued or running Task
+        self._changed = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, name=f"service-{idx}", daemon=True) for idx in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def task_key(subj):
+        return hashlib.sha256(f"{PROMPT_VERSION}\n{build_prompt(**subj)}".encode("utf-8")).hexdigest()
+
+    def submit(self, subjects, department=DEFAULT_DEPARTMENT):
+        jobs = []
+        with self._changed:
+            self._prune(len(subjects))
+            for subj in subjects:
+                key = self.task_key(subj)
+                task = self._tasks.get(key)
+                coalesced = task is not None
+                if task is None:
+                    task = Task(key, subj, department)
+                    # Enqueue first, so a failure cannot leave a task that later submissions join but nothing runs
+                    self.queue.put(department, task)
+                    self._tasks[key] = task
+                    journal.mark(subj, "queued", hash=key)
+                job = Job(task, department, coalesced)
+                self.jobs[job.id] = job
+                self.counters["jobs"] += 1
+                self.counters["coalesced"] += coalesced
+                jobs.append(job)
+        return jobs
+
+    def _prune(self, incoming):
+        # Called with self._changed held; jobs is in submission order, so the oldest go first
+        cutoff = time.time() - self.job_ttl
+        excess = len(self.jobs) + incoming - self.max_jobs
+        for job_id, job in list(self.jobs.items()):
+            if job.task.status in TERMINAL and (excess > 0 or job.task.finished < cutoff):
+                del self.jobs[job_id]
+                excess -= 1
+
+    def _set(self, task, status, **fields):
+        with self._changed:
+            task.status = status
+            for name, value in fields.items():
+                setattr(task, name, value)
+            if status in TERMINAL:
+                # Later submissions of this prompt start fresh (and usually hit the response cache)
+                self._tasks.pop(task.key, None)
+                self.counters[status] += 1
+            self._changed.notify_all()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            self._set(task, "running", started=time.time())
+            try:
+                # Each task gets its own directory, so subjects that share a title never overwrite each other
+                with output_dir(os.path.join(SERVICE_OUTPUT_DIR, task.key[:16])):
+                    artifacts = self.process(task.subj)
+            except Exception as e:
+                journal.mark(task.subj, "failed", reason=str(e))
+                self._set(task, "failed", error=str(e), finished=time.time())
+            else:
+                self._set(task, "done", artifacts=list(artifacts), finished=time.time())
+
+    def wait_for_change(self, job, last_status, timeout=15.0):
+        """Block until job's status differs from last_status or timeout passes."""
+        with self._changed:
+            self._changed.wait_for(lambda: job.task.status != last_status, timeout=timeout)
+            return job.to_dict()
+
+    def status(self):
+        with self._changed:
+            running = sum(1 for task in self._tasks.values() if task.status == "running")
+            counters = dict(self.counters)
+        return {"queued": self.queue.depths(), "running": running, "workers": len(self._threads), **counters}
+
+    def close(self):
+        self.queue.close()
+        for thread in self._threads:
+            thread.join()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._json(404, {"error": f"no job {job_id}"})
+        return job
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/jobs":
+            return self._json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._json(400, {"error": "invalid Content-Length"})
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            return self._json(400, {"error": f"invalid JSON: {e}"})
+        if not isinstance(payload, dict):
+            return self._json(400, {"error": "expected a JSON object"})
+
+        department = payload.pop("department", None) or self.headers.get("X-Department") or DEFAULT_DEPARTMENT
+        if not isinstance(department, str) or not department.strip():
+            return self._json(400, {"error": "department must be a non-empty string"})
+        subjects = payload["subjects"] if "subjects" in payload else [payload]
+        if not isinstance(subjects, list) or not subjects:
+            return self._json(400, {"error": "subjects must be a non-empty list"})
+        errors = {idx: error for idx, subj in enumerate(subjects) if (error := validate_subject(subj))}
+        if errors:
+            return self._json(400, {"error": "invalid subject(s)", "subjects": errors})
+
+        jobs = self.service.submit(subjects, department)
+        self._json(202, {"jobs": [job.to_dict() for job in jobs]})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["status"]:
+            return self._json(200, self.service.status())
+        if parts == ["jobs"]:
+            department = parse_qs(url.query).get("department", [None])[0]
+            jobs = [job.to_dict() for job in list(self.service.jobs.values()) if department in (None, job.department)]
+            return self._json(200, {"jobs": jobs})
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if len(parts) == 2:
+                return self._json(200, job.to_dict())
+            if parts[2:] == ["events"]:
+                return self._events(job)
+            if len(parts) == 4 and parts[2] == "artifacts":
+                return self._artifact(job, parts[3])
+        self._json(404, {"error": "not found"})
+
+    def _events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        state, last = job.to_dict(), None
+        try:
+            while True:
+                if state["status"] != last:
+                    self.wfile.write(f"event: status\ndata: {json.dumps(state, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    last = state["status"]
+                if last in TERMINAL:
+                    return
+                state = self.service.wait_for_change(job, last)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _artifact(self, job, name):
+        # Only files this job produced can be downloaded
+        path = next((path for path in job.task.artifacts if os.path.basename(path) == name), None)
+        if path is None or not os.path.exists(path):
+            return self._json(404, {"error": f"no artifact {name} for job {job.id}"})
+        types = {".pdf": "application/pdf", ".html": "text/html; charset=utf-8", ".md": "text/markdown; charset=utf-8", ".json": "application/json"}
+        self.send_response(200)
+        self.send_header("Content-Type", types.get(os.path.splitext(name)[1], "application/octet-stream"))
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            while chunk := f.read(64 * 1024):
+                self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        # Job progress is already printed by the pipeline
+        pass
+
+
+def serve(model, cache, host="127.0.0.1", port=8765, workers=4):
+    """Run the service until interrupted; returns the GenerationService for its counters."""
+    service = GenerationService(model, cache, workers=workers)
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"🛰️ Serving on http://{host}:{port} with {workers} worker(s)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+    return service
@@ -0,0 +1,236 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from backends import BLOOM_VERBS
+
+BLOOM_LEVELS = list(BLOOM_VERBS)
+
+# Leading verb -> Bloom level, for text-mode COs that do not state their level
+BLOOM_VERB_LEVELS = {
+    verb: level
+    for level, verbs in {
+        "Remembering": "define describe identify label list name recall recognize state",
+        "Understanding": "classify discuss explain illustrate interpret outline summarize understand",
+        "Applying": "apply compute demonstrate employ implement solve use",
+        "Analyzing": "analyze analyse compare contrast differentiate distinguish examine investigate",
+        "Evaluating": "appraise assess critique evaluate judge justify validate",
+        "Creating": "build construct create design develop formulate plan propose",
+    }.items()
+    for verb in verbs.split()
+}
+
+OUTCOME_LINE = re.compile(r"^((?:CO|PO)\d+)\s*:\s*(.*)$")
+TRAILING_LEVEL = re.compile(r"\((%s)\)\s*$" % "|".join(BLOOM_LEVELS), re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    program TEXT NOT NULL,
+    semester TEXT NOT NULL,
+    subject_title TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    raw_response TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (program, semester, subject_title, model_name)
+);
+CREATE INDEX IF NOT EXISTS subjects_semester ON subjects (semester, program);
+CREATE INDEX IF NOT EXISTS subjects_title ON subjects (subject_title);
+CREATE INDEX IF NOT EXISTS subjects_model ON subjects (model_name);
+CREATE TABLE IF NOT EXISTS course_outcomes (
+    subject_id INTEGER NOT NULL REFERENCES subjects (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    unit INTEGER,
+    bloom_level TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (subject_id, position)
+);
+CREATE INDEX IF NOT EXISTS course_outcomes_level ON course_outcomes (bloom_level, subject_id);
+CREATE TABLE IF NOT EXISTS program_outcomes (
+    subject_id INTEGER NOT NULL REFERENCES subjects (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (subject_id, position)
+);
+"""
+
+
+def split_outcome(outcome):
+    """Split "CO1: text" into ("CO1", "text"); the code is "" if there is none."""
+    match = OUTCOME_LINE.match(outcome.strip())
+    return (match.group(1), match.group(2)) if match else ("", outcome.strip())
+
+
+def bloom_level(outcome):
+    """Bloom level stated as a trailing "(Level)" or implied by the leading verb, else None."""
+    _, body = split_outcome(outcome)
+    match = TRAILING_LEVEL.search(body)
+    if match:
+        return match.group(1).capitalize()
+    words = re.findall(r"[A-Za-z]+", body)
+    return BLOOM_VERB_LEVELS.get(words[0].lower()) if words else None
+
+
+class OutcomeStore:
+    """SQLite store of every generated subject: inputs, raw response, parsed COs and POs.
+
+    One row per (program, semester, subject_title, model_name); recording a
+    subject again replaces its outcomes. COs keep their unit (when the answer
+    was grouped by unit) and Bloom level so they can be queried directly.
+    """
+
+    def __init__(self, path="syllabus_outcomes.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._dirty = False
+
+    def record(self, subj, model_name, raw_response, course_outcomes, program_outcomes, unit_outcomes=None):
+        # unit_outcomes lists the same COs as course_outcomes, grouped by unit
+        units = [unit["unit"] for unit in unit_outcomes or [] for _ in unit["course_outcomes"]]
+        if len(units) != len(course_outcomes):
+            units = [None] * len(course_outcomes)
+
+        with self._lock, self._conn:
+            key = (subj["program"], subj["semester"], subj["subject_title"], model_name)
+            self._conn.execute(
+                "INSERT INTO subjects (program, semester, subject_title, model_name, inputs, raw_response, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (program, semester, subject_title, model_name) DO UPDATE SET "
+                "inputs = excluded.inputs, raw_response = excluded.raw_response, updated = excluded.updated",
+                (*key, json.dumps(subj, ensure_ascii=False), raw_response, time.time()),
+            )
+            subject_id = self._conn.execute(
+                "SELECT id FROM subjects WHERE program = ? AND semester = ? AND subject_title = ? AND model_name = ?", key
+            ).fetchone()[0]
+            self._conn.execute("DELETE FROM course_outcomes WHERE subject_id = ?", (subject_id,))
+            self._conn.execute("DELETE FROM program_outcomes WHERE subject_id = ?", (subject_id,))
+            self._conn.executemany(
+                "INSERT INTO course_outcomes (subject_id, position, code, unit, bloom_level, text) VALUES (?, ?, ?, ?, ?, ?)",
+                [(subject_id, pos, split_outcome(co)[0], unit, bloom_level(co), co) for pos, (co, unit) in enumerate(zip(course_outcomes, units))],
+            )
+            self._conn.executemany(
+                "INSERT INTO program_outcomes (subject_id, position, code, text) VALUES (?, ?, ?, ?)",
+                [(subject_id, pos, split_outcome(po)[0], po) for pos, po in enumerate(program_outcomes)],
+            )
+            self._dirty = True
+        return subject_id
+
+    @staticmethod
+    def _where(filters):
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def subjects(self, program=None, semester=None, subject_title=None, model_name=None):
+        where, params = self._where({"program": program, "semester": semester, "subject_title": subject_title, "model_name": model_name})
+        with self._lock:
+            return self._conn.execute(f"SELECT * FROM subjects{where} ORDER BY program, semester, subject_title, model_name", params).fetchall()
+
+    def programs(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT program FROM subjects ORDER BY program")]
+
+    def catalog_index(self, program, model_name=None):
+        """(id, semester, subject_title, model_name) of the latest row per subject in a program.
+
+        Skips inputs and raw responses so the index stays small for large programs.
+        """
+        where, params = self._where({"program": program, "model_name": model_name})
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, semester, subject_title, model_name FROM subjects{where} "
+                "ORDER BY semester, subject_title, updated DESC",
+                params,
+            ).fetchall()
+        latest = {}
+        for row in rows:
+            latest.setdefault((row["semester"], row["subject_title"]), row)
+        return list(latest.values())
+
+    def subject(self, subject_id):
+        with self._lock:
+            return self._conn.execute("SELECT * FROM subjects WHERE id = ?", (subject_id,)).fetchone()
+
+    def course_outcomes(self, program=None, semester=None, subject_title=None, model_name=None, bloom_level=None, unit=None):
+        """Matching COs as rows of (program, semester, subject_title, model_name, code, unit, bloom_level, text)."""
+        where, params = self._where({
+            "s.program": program,
+            "s.semester": semester,
+            "s.subject_title": subject_title,
+            "s.model_name": model_name,
+            "co.bloom_level": bloom_level,
+            "co.unit": unit,
+        })
+        with self._lock:
+            return self._conn.execute(
+                "SELECT s.program, s.semester, s.subject_title, s.model_name, co.code, co.unit, co.bloom_level, co.text "
+                f"FROM course_outcomes co JOIN subjects s ON s.id = co.subject_id{where} "
+                "ORDER BY s.program, s.semester, s.subject_title, co.position",
+                params,
+            ).fetchall()
+
+    def outcome_data(self, row):
+        """Rebuild the refine3.outcome_data dict (plus unit_outcomes when known) for a subjects row."""
+        subj = json.loads(row["inputs"])
+        with self._lock:
+            cos = self._conn.execute("SELECT unit, text FROM course_outcomes WHERE subject_id = ? ORDER BY position", (row["id"],)).fetchall()
+            pos = self._conn.execute("SELECT text FROM program_outcomes WHERE subject_id = ? ORDER BY position", (row["id"],)).fetchall()
+
+        unit_outcomes = None
+        if cos and all(co["unit"] is not None for co in cos):
+            titles = {idx: unit["title"] for idx, unit in enumerate(subj["units"], start=1)}
+            grouped = {}
+            for co in cos:
+                grouped.setdefault(co["unit"], []).append(co["text"])
+            unit_outcomes = [{"unit": unit, "title": titles.get(unit, f"Unit {unit}"), "course_outcomes": texts} for unit, texts in grouped.items()]
+        return {
+            "subject_title": subj["subject_title"],
+            "program": subj["program"],
+            "semester": subj["semester"],
+            "prerequisites": subj["prerequisites"],
+            "credits": subj["credits"],
+            "aim": subj["aim"],
+            "course_outcomes": [co["text"] for co in cos],
+            "program_outcomes": [po["text"] for po in pos],
+            "unit_outcomes": unit_outcomes,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._dirty:
+                # Refresh planner statistics so semester/level queries drive from the right index
+                self._conn.execute("PRAGMA analysis_limit=1000")
+                self._conn.execute("ANALYZE")
+            self._conn.close()
+
+
+_store = None
+
+
+def configure(path):
+    """Open the store that record() writes to; a falsy path disables recording."""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = OutcomeStore(path) if path else None
+    return _store
+
+
+def record(subj, model_name, raw_response, course_outcomes, program_outcomes, unit_outcomes=None):
+    # No-op unless a store has been configured for this run
+    if _store is not None:
+        _store.record(subj, model_name, raw_response, course_outcomes, program_outcomes, unit_outcomes)
@@ -0,0 +1,150 @@
+import time
+
+from reportlab.platypus import Paragraph, Spacer
+
+import journal
+import store
+from refine3 import (
+    articulation_table,
+    build_pdf,
+    build_prompt,
+    outcome_data,
+    outcome_paragraph,
+    output_formats,
+    pdf_filename,
+    save_outcomes,
+    story_header,
+    stylesheet,
+)
+from renderers import atomic_write, write_outputs
+from repair import repair_outcomes
+
+
+class MalformedResponseError(Exception):
+    pass
+
+
+class OutcomeStreamParser:
+    """Incremental version of refine3.parse_outcomes that is fed response chunks.
+
+    on_outcome(kind, outcome) is called with kind "CO" or "PO" as soon as an
+    outcome's line is complete. MalformedResponseError is raised as soon as the
+    response is clearly off-format (too many lines that are neither headers nor
+    outcomes, or Course Outcomes after Program Outcomes), so the caller can
+    abandon the stream instead of waiting for the rest of it.
+    """
+
+    def __init__(self, on_outcome=None, max_stray_lines=5):
+        self.on_outcome = on_outcome
+        self.max_stray_lines = max_stray_lines
+        self.course_outcomes = []
+        self.program_outcomes = []
+        self.first_outcome_at = None
+        self._buffer = ""
+        self._in_cos = False
+        self._in_pos = False
+        self._seen_pos = False
+        self._stray_lines = 0
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._line(line.strip())
+
+    def close(self):
+        if self._buffer:
+            self._line(self._buffer.strip())
+            self._buffer = ""
+        return self.course_outcomes, self.program_outcomes
+
+    def _line(self, line):
+        if line.startswith("### Course Outcomes"):
+            if self._seen_pos:
+                raise MalformedResponseError("Course Outcomes section after Program Outcomes")
+            self._in_cos, self._in_pos = True, False
+        elif line.startswith("### Program Outcomes"):
+            self._in_cos, self._in_pos = False, True
+            self._seen_pos = True
+        elif line.startswith("- CO") and self._in_cos:
+            self._emit("CO", line[2:].strip(), self.course_outcomes)
+        elif line.startswith("- PO") and self._in_pos:
+            self._emit("PO", line[2:].strip(), self.program_outcomes)
+        elif line and line not in ("---", "...", "- ..."):
+            self._stray_lines += 1
+            if self._stray_lines > self.max_stray_lines:
+                raise MalformedResponseError(f"more than {self.max_stray_lines} unexpected lines")
+
+    def _emit(self, kind, outcome, outcomes):
+        if self.first_outcome_at is None:
+            self.first_outcome_at = time.perf_counter()
+        outcomes.append(outcome)
+        if self.on_outcome is not None:
+            self.on_outcome(kind, outcome)
+
+
+class StoryBuilder:
+    """Builds the create_pdf story incrementally as outcomes are parsed."""
+
+    def __init__(self, data, styles):
+        self.styles = styles
+        self.story = story_header(data, styles)
+        self.story.append(Paragraph("Course Outcomes (COs)", styles["Heading2"]))
+        self.outcomes = {"CO": [], "PO": []}
+        self._in_pos = False
+
+    def _start_pos(self):
+        self.story.append(Spacer(1, 12))
+        self.story.append(Paragraph("Program Outcomes (POs)", self.styles["Heading2"]))
+        self._in_pos = True
+
+    def add(self, kind, outcome):
+        if kind == "PO" and not self._in_pos:
+            self._start_pos()
+        self.outcomes[kind].append(outcome)
+        self.story.append(outcome_paragraph(outcome, self.styles))
+
+    def finish(self):
+        if not self._in_pos:
+            self._start_pos()
+        self.story.extend(articulation_table(self.outcomes["CO"], self.outcomes["PO"], self.styles))
+        self.story.append(Spacer(1, 24))
+        return self.story
+
+
+def process_subject_streaming(subj, model, cache, save=save_outcomes):
+    """Streaming counterpart of refine3.process_subject."""
+    print(f"\n📘 GENERATING SYLLABUS FOR: {subj['subject_title']}")
+
+    formats = output_formats()
+    # The PDF story is only worth building alongside the stream when a PDF is wanted and rendered here
+    builder = StoryBuilder(outcome_data(subj, [], []), stylesheet()) if "pdf" in formats and save is save_outcomes else None
+    parser = OutcomeStreamParser(on_outcome=builder.add if builder else None)
+    stream = cache.stream(model, build_prompt(**subj))
+    parts = []
+    try:
+        for chunk in stream:
+            parts.append(chunk)
+            parser.feed(chunk)
+        course_outcomes, program_outcomes = parser.close()
+        journal.mark(subj, "generated")
+    except MalformedResponseError as e:
+        stream.close()
+        print(f"⚠️ Aborted malformed response for {subj['subject_title']}: {e}")
+        # Keep whatever was parsed before the abort and repair the rest
+        course_outcomes, program_outcomes = list(parser.course_outcomes), list(parser.program_outcomes)
+
+    parsed = (course_outcomes, program_outcomes)
+    course_outcomes, program_outcomes = repair_outcomes(subj, model, cache, course_outcomes, program_outcomes)
+    store.record(subj, model.model_name, "".join(parts), course_outcomes, program_outcomes)
+    journal.mark(subj, "parsed", model=model.model_name)
+    if builder is None or (course_outcomes, program_outcomes) != parsed:
+        # The incrementally built story holds the unrepaired outcomes
+        return save(subj, course_outcomes, program_outcomes)
+    filename = pdf_filename(subj)
+    story = builder.finish()
+    atomic_write(filename, lambda path: build_pdf(story, path))
+    others = [fmt for fmt in formats if fmt != "pdf"]
+    filenames = [filename] + write_outputs(outcome_data(subj, course_outcomes, program_outcomes), others)
+    journal.mark(subj, "rendered", outputs=filenames)
+    return filenames
@@ -0,0 +1,188 @@
+import json
+import re
+
+import journal
+import store
+from refine3 import format_units, generate_outcomes, save_outcomes
+from repair import OutcomeError, repair_unit_outcomes
+
+BLOOM_LEVELS = ["Remembering", "Understanding", "Applying", "Analyzing", "Evaluating", "Creating"]
+
+# Declared shape of a structured answer (JSON Schema)
+OUTCOME_SCHEMA = {
+    "type": "object",
+    "required": ["units", "program_outcomes"],
+    "properties": {
+        "units": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["unit", "title", "course_outcomes"],
+                "properties": {
+                    "unit": {"type": "integer"},
+                    "title": {"type": "string"},
+                    "course_outcomes": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "required": ["id", "bloom_level", "text"],
+                            "properties": {
+                                "id": {"type": "string", "pattern": "^CO[0-9]+$"},
+                                "bloom_level": {"type": "string", "enum": BLOOM_LEVELS},
+                                "text": {"type": "string"},
+                            },
+                        },
+                    },
+                },
+            },
+        },
+        "program_outcomes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["id", "text"],
+                "properties": {
+                    "id": {"type": "string", "pattern": "^PO[0-9]+$"},
+                    "text": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+JSON_SETTINGS = {"generation_config": {"response_mime_type": "application/json"}}
+
+CO_ID = re.compile(r"^CO\d+$")
+PO_ID = re.compile(r"^PO\d+$")
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def build_json_prompt(subject_title, program, semester, prerequisites, credits, aim, units, program_goals, graduate_attributes):
+    return f"""
+You are an education expert helping generate course and program outcomes for university syllabi following **VTU (Visvesvaraya Technological University)** guidelines.
+
+Subject Title: {subject_title}
+Program: {program}
+Semester: {semester}
+Prerequisites: {prerequisites}
+Credits: {credits}
+
+Overall Subject Aim:
+{aim}
+
+{format_units(units)}
+
+Based on this information:
+
+### Instructions:
+Generate exactly 2–3 Course Outcomes (COs) per unit, numbered CO1, CO2, ... across the whole subject, each tagged with one Bloom's Taxonomy level from: {', '.join(BLOOM_LEVELS)}.
+
+Also, generate exactly 6 Program Outcomes (POs) based on the program goals and graduate attributes, numbered PO1 to PO6.
+
+Each outcome must be:
+- Actionable and measurable
+- Use verbs aligned with Bloom's Taxonomy
+- Written in concise, academic language
+
+Respond with a single JSON object matching this JSON Schema and nothing else:
+{json.dumps(OUTCOME_SCHEMA)}
+"""
+
+
+def _require(condition, path, message):
+    if not condition:
+        raise SchemaError(f"{path}: {message}")
+
+
+def parse_structured(text, unit_count=None):
+    """Validate a JSON answer against OUTCOME_SCHEMA in a single pass.
+
+    Returns (unit_outcomes, program_outcomes) where unit_outcomes is a list of
+    {"unit", "title", "course_outcomes"} dicts and outcomes are "CO1: text (Level)"
+    / "PO1: text" strings. Raises SchemaError naming the first offending path.
+    Outcome counts are not part of the schema; repair.repair_unit_outcomes
+    holds them to 2-3 COs per unit and 6 POs.
+    """
+    try:
+        doc = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise SchemaError(f"$: not valid JSON ({e})")
+
+    _require(isinstance(doc, dict), "$", "expected an object")
+    units = doc.get("units")
+    _require(isinstance(units, list) and units, "$.units", "expected a non-empty array")
+    if unit_count is not None:
+        _require(len(units) == unit_count, "$.units", f"expected {unit_count} units, got {len(units)}")
+
+    levels = {level.lower(): level for level in BLOOM_LEVELS}
+    seen = set()
+    numbers = set()
+    unit_outcomes = []
+    for i, unit in enumerate(units):
+        path = f"$.units[{i}]"
+        _require(isinstance(unit, dict), path, "expected an object")
+        number = unit.get("unit")
+        # bool is an int subclass but not a JSON integer
+        _require(isinstance(number, int) and not isinstance(number, bool), f"{path}.unit", f"expected an integer, got {number!r}")
+        if unit_count is not None:
+            _require(1 <= number <= unit_count, f"{path}.unit", f"expected 1..{unit_count}, got {number}")
+        _require(number not in numbers, f"{path}.unit", f"duplicate unit {number}")
+        numbers.add(number)
+        _require(isinstance(unit.get("title"), str), f"{path}.title", "expected a string")
+        cos = unit.get("course_outcomes")
+        _require(isinstance(cos, list), f"{path}.course_outcomes", "expected an array")
+        outcomes = []
+        for j, co in enumerate(cos):
+            co_path = f"{path}.course_outcomes[{j}]"
+            _require(isinstance(co, dict), co_path, "expected an object")
+            co_id, level, body = co.get("id"), co.get("bloom_level"), co.get("text")
+            _require(isinstance(co_id, str) and CO_ID.match(co_id), f"{co_path}.id", f"expected CO<n>, got {co_id!r}")
+            _require(co_id not in seen, f"{co_path}.id", f"duplicate {co_id}")
+            _require(isinstance(level, str) and level.lower() in levels, f"{co_path}.bloom_level", f"unknown level {level!r}")
+            _require(isinstance(body, str) and body.strip(), f"{co_path}.text", "expected non-empty text")
+            seen.add(co_id)
+            outcomes.append(f"{co_id}: {body.strip()} ({levels[level.lower()]})")
+        unit_outcomes.append({"unit": number, "title": unit["title"], "course_outcomes": outcomes})
+
+    pos = doc.get("program_outcomes")
+    _require(isinstance(pos, list), "$.program_outcomes", "expected an array")
+    program_outcomes = []
+    for j, po in enumerate(pos):
+        po_path = f"$.program_outcomes[{j}]"
+        _require(isinstance(po, dict), po_path, "expected an object")
+        po_id, body = po.get("id"), po.get("text")
+        _require(isinstance(po_id, str) and PO_ID.match(po_id), f"{po_path}.id", f"expected PO<n>, got {po_id!r}")
+        _require(po_id not in seen, f"{po_path}.id", f"duplicate {po_id}")
+        _require(isinstance(body, str) and body.strip(), f"{po_path}.text", "expected non-empty text")
+        seen.add(po_id)
+        program_outcomes.append(f"{po_id}: {body.strip()}")
+
+    return unit_outcomes, program_outcomes
+
+
+def process_subject_structured(subj, model, cache, save=save_outcomes):
+    """JSON-mode counterpart of refine3.process_subject.
+
+    Units or POs short of the VTU shape go through the shared repair path.
+    Falls back to the text prompt if the JSON answer does not validate or
+    is still incomplete after repair.
+    """
+    print(f"\n📘 GENERATING SYLLABUS FOR: {subj['subject_title']} (JSON)")
+
+    text_output = cache.generate(model, build_json_prompt(**subj), **JSON_SETTINGS)
+    journal.mark(subj, "generated")
+    try:
+        unit_outcomes, program_outcomes = parse_structured(text_output, unit_count=len(subj["units"]))
+        unit_outcomes, course_outcomes, program_outcomes = repair_unit_outcomes(subj, model, cache, unit_outcomes, program_outcomes)
+    except (SchemaError, OutcomeError) as e:
+        print(f"⚠️ JSON answer for {subj['subject_title']} failed validation ({e}). Falling back to text prompt.")
+        course_outcomes, program_outcomes = generate_outcomes(subj, model, cache)
+        unit_outcomes = None
+    else:
+        store.record(subj, model.model_name, text_output, course_outcomes, program_outcomes, unit_outcomes)
+        journal.mark(subj, "parsed", model=model.model_name)
+
+    return save(subj, course_outcomes, program_outcomes, unit_outcomes)
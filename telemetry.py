@@ -0,0 +1,186 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Per-subject record that generate calls, the cache and the parser annotate.
+# engine.run_concurrently copies the context into its worker threads, so calls
+# fanned out on behalf of a subject are still counted against it.
+_current = contextvars.ContextVar("telemetry_record", default=None)
+
+RECORD_FIELDS = ["api_calls", "input_tokens", "output_tokens", "retries", "cache_hits", "cache_misses", "cache_coalesced", "parse_ok", "parse_repaired", "parse_failed"]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class Telemetry:
+    """Collects per-call and per-subject events for one run.
+
+    With a directory, events are appended to <directory>/<run_id>.jsonl as they
+    happen and write_prometheus() produces <directory>/<run_id>.prom.
+    """
+
+    def __init__(self, directory=None, run_id=None):
+        self.directory = directory
+        self.run_id = run_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.started = time.perf_counter()
+        self.subject_latencies = []
+        self.call_latencies = []
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._log = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._log = open(os.path.join(directory, f"{self.run_id}.jsonl"), "a", encoding="utf-8")
+
+    def emit(self, event):
+        if self._log is None:
+            return
+        line = json.dumps(dict(event, run=self.run_id, ts=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._log.write(line + "\n")
+            self._log.flush()
+
+    @contextmanager
+    def subject(self, title, count=1):
+        """Collect everything recorded inside the block into one event; count > 1 for batches."""
+        record = {"type": "subject", "subject": title, "subjects": count, **{field: 0 for field in RECORD_FIELDS}}
+        token = _current.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+            record["status"] = "ok"
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+            raise
+        finally:
+            _current.reset(token)
+            record["latency_s"] = time.perf_counter() - start
+            with self._lock:
+                self.subject_latencies.append(record["latency_s"])
+                self.counters[f"subjects_{record['status']}"] += count
+            self.emit(record)
+
+    def add(self, field, amount=1):
+        record = _current.get()
+        with self._lock:
+            self.counters[field] += amount
+            if record is not None:
+                record[field] = record.get(field, 0) + amount
+
+    def note(self, field, value):
+        """Set a field on the current subject record, e.g. the model that served it."""
+        record = _current.get()
+        if record is not None:
+            with self._lock:
+                record[field] = value
+
+    def call(self, latency, response=None, error=None, attempt=0):
+        """Record one generate_content attempt and its usage metadata."""
+        usage = getattr(response, "usage_metadata", None)
+        input_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        with self._lock:
+            self.call_latencies.append(latency)
+            self.counters["calls_error" if error is not None else "calls_ok"] += 1
+        self.add("api_calls")
+        self.add("input_tokens", input_tokens)
+        self.add("output_tokens", output_tokens)
+        record = _current.get()
+        self.emit({
+            "type": "call",
+            "subject": record["subject"] if record else None,
+            "latency_s": latency,
+            "attempt": attempt,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "error": str(error) if error is not None else None,
+        })
+
+    def write_prometheus(self):
+        if not self.directory:
+            return None
+        calls = sorted(self.call_latencies)
+        subjects = sorted(self.subject_latencies)
+        c = self.counters
+        lines = [
+            "# TYPE syllabus_subjects_total counter",
+            f'syllabus_subjects_total{{status="ok"}} {c["subjects_ok"]}',
+            f'syllabus_subjects_total{{status="error"}} {c["subjects_error"]}',
+            "# TYPE syllabus_generate_calls_total counter",
+            f'syllabus_generate_calls_total{{outcome="ok"}} {c["calls_ok"]}',
+            f'syllabus_generate_calls_total{{outcome="error"}} {c["calls_error"]}',
+            "# TYPE syllabus_generate_retries_total counter",
+            f"syllabus_generate_retries_total {c['retries']}",
+            "# TYPE syllabus_tokens_total counter",
+            f'syllabus_tokens_total{{direction="input"}} {c["input_tokens"]}',
+            f'syllabus_tokens_total{{direction="output"}} {c["output_tokens"]}',
+            "# TYPE syllabus_cache_lookups_total counter",
+            f'syllabus_cache_lookups_total{{result="hit"}} {c["cache_hits"]}',
+            f'syllabus_cache_lookups_total{{result="miss"}} {c["cache_misses"]}',
+            f'syllabus_cache_lookups_total{{result="coalesced"}} {c["cache_coalesced"]}',
+            "# TYPE syllabus_parse_total counter",
+            f'syllabus_parse_total{{result="ok"}} {c["parse_ok"]}',
+            f'syllabus_parse_total{{result="repaired"}} {c["parse_repaired"]}',
+            f'syllabus_parse_total{{result="failed"}} {c["parse_failed"]}',
+        ]
+        for name, values in (("syllabus_generate_latency_seconds", calls), ("syllabus_subject_latency_seconds", subjects)):
+            lines.append(f"# TYPE {name} summary")
+            for q in (50, 95, 99):
+                lines.append(f'{name}{{quantile="{q / 100}"}} {percentile(values, q):.6f}')
+            lines.append(f"{name}_sum {sum(values):.6f}")
+            lines.append(f"{name}_count {len(values)}")
+
+        path = os.path.join(self.directory, f"{self.run_id}.prom")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        subjects = sorted(self.subject_latencies)
+        c = self.counters
+        done = c["subjects_ok"] + c["subjects_error"]
+        tokens = (c["input_tokens"] + c["output_tokens"]) / done if done else 0
+        return (
+            f"📈 {done} subject(s) in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.2f}/s) · "
+            f"latency p50 {percentile(subjects, 50):.2f}s p95 {percentile(subjects, 95):.2f}s p99 {percentile(subjects, 99):.2f}s · "
+            f"{tokens:.0f} tokens/subject · {c['api_calls']} calls, {c['retries']} retries, "
+            f"cache {c['cache_hits']} hit / {c['cache_misses']} miss / {c['cache_coalesced']} coalesced, {c['parse_repaired']} repaired, {c['parse_failed']} unrepairable"
+        )
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+_recorder = Telemetry()
+
+
+def configure(directory=None, run_id=None):
+    global _recorder
+    _recorder.close()
+    _recorder = Telemetry(directory, run_id)
+    return _recorder
+
+
+def recorder():
+    return _recorder
+
+
+def traced(worker):
+    """Wrap worker(subj) so each subject gets its own telemetry record."""
+    def run(subj):
+        with _recorder.subject(subj["subject_title"]):
+            return worker(subj)
+    return run